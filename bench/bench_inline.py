@@ -0,0 +1,97 @@
+# Inline parsing on prose-heavy text, where most lines contain no markup, compared
+# with the previous implementation (uncompiled patterns, five passes per line).
+#   python3 bench/bench_inline.py [--lines N] [--markup-rate R]
+import argparse, os, random, re, sys, timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+from corpus import sentence
+from textnode import TextNode, TextType
+from inline_markdown import (text_to_textnodes, text_to_children, text_to_html,
+                             extract_markdown_images, extract_markdown_links)
+
+
+def legacy_split_nodes_delimiter(old_nodes, delimiter, text_type):
+    new_nodes = []
+    for node in old_nodes:
+        if node.text_type != TextType.TEXT:
+            new_nodes.append(node)
+            continue
+        split = node.text.split(delimiter)
+        if delimiter not in node.text:
+            new_nodes.append(node)
+            continue
+        for i, item in enumerate(split):
+            if i % 2 == 0:
+                if item != "":
+                    new_nodes.append(TextNode(item, TextType.TEXT))
+            else:
+                new_nodes.append(TextNode(item, text_type))
+    return new_nodes
+
+def legacy_extract_markdown_images(text):
+    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+
+def legacy_extract_markdown_links(text):
+    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+
+def legacy_split(old_nodes, extract, fmt, text_type):
+    new_nodes = []
+    for node in old_nodes:
+        if node.text_type != TextType.TEXT:
+            new_nodes.append(node)
+            continue
+        node_text = node.text
+        matches = extract(node_text)
+        if not matches:
+            new_nodes.append(node)
+            continue
+        for text, url in matches:
+            split_text = node_text.split(fmt.format(text, url), 1)
+            if split_text[0] != "":
+                new_nodes.append(TextNode(split_text[0], TextType.TEXT))
+            new_nodes.append(TextNode(text, text_type, url))
+            node_text = split_text[1]
+        if node_text != "":
+            new_nodes.append(TextNode(node_text, TextType.TEXT))
+    return new_nodes
+
+def legacy_text_to_textnodes(text):
+    nodes = [TextNode(line, TextType.TEXT) for line in text.split("\n")]
+    nodes = legacy_split_nodes_delimiter(nodes, '**', TextType.BOLD)
+    nodes = legacy_split_nodes_delimiter(nodes, '_', TextType.ITALIC)
+    nodes = legacy_split_nodes_delimiter(nodes, '`', TextType.CODE)
+    nodes = legacy_split(nodes, legacy_extract_markdown_images, "![{}]({})", TextType.IMAGE)
+    return legacy_split(nodes, legacy_extract_markdown_links, "[{}]({})", TextType.LINK)
+
+def legacy_text_to_children(text):
+    return [text_to_html(node) for node in legacy_text_to_textnodes(text)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline parsing microbenchmark")
+    parser.add_argument("--lines", type=int, default=20_000)
+    parser.add_argument("--markup-rate", type=float, default=0.002,
+                        help="chance that a word carries inline markup")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    lines = [sentence(rng, 16, args.markup_rate) for _ in range(args.lines)]
+    plain = sum(1 for line in lines if not any(c in line for c in "*_`["))
+    print(f"{args.lines} lines, {plain / args.lines:.0%} without markup")
+    to_html = lambda nodes: "".join(node.to_html() for node in nodes)
+    cases = [
+        ("extract images+links", lambda line: (legacy_extract_markdown_images(line), legacy_extract_markdown_links(line)),
+                                 lambda line: (extract_markdown_images(line), extract_markdown_links(line)), repr),
+        ("text_to_textnodes", legacy_text_to_textnodes, text_to_textnodes, repr),
+        ("text_to_children", legacy_text_to_children, text_to_children, to_html),
+    ]
+    for name, legacy, current, normalize in cases:
+        for line in lines[:500]:
+            assert normalize(legacy(line)) == normalize(current(line)), line
+        before = min(timeit.repeat(lambda: [legacy(line) for line in lines], number=1, repeat=args.repeat))
+        after = min(timeit.repeat(lambda: [current(line) for line in lines], number=1, repeat=args.repeat))
+        print(f"  {name:<22}{before * 1e3:>9.1f} ms -> {after * 1e3:>7.1f} ms  ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Per-node memory and construction time of the node classes, compared with the
+# previous __dict__-based layout. Run from the repository root:
+#   python3 bench/bench_nodes.py [--count N]
+import argparse, os, sys, timeit, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from textnode import TextNode, TextType
+from htmlnode import LeafNode, ParentNode
+
+
+class LegacyTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+class LegacyHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+class LegacyLeafNode(LegacyHTMLNode):
+    def __init__(self, tag, value, props=None):
+        super().__init__()
+        self.tag = tag
+        self.value = value
+        self.props = props
+
+class LegacyParentNode(LegacyHTMLNode):
+    def __init__(self, tag, children, props=None):
+        super().__init__()
+        self.tag = tag
+        self.children = children
+        self.props = props
+
+
+CASES = {
+    "TextNode": (lambda: LegacyTextNode("some text", TextType.TEXT), lambda: TextNode("some text", TextType.TEXT)),
+    "LeafNode": (lambda: LegacyLeafNode("b", "bold"), lambda: LeafNode("b", "bold")),
+    "LeafNode(props)": (lambda: LegacyLeafNode("a", "link", {"href": "/x"}), lambda: LeafNode("a", "link", {"href": "/x"})),
+    "ParentNode": (lambda: LegacyParentNode("p", []), lambda: ParentNode("p", [])),
+}
+
+def bytes_per_node(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Exclude the list holding the nodes
+    return (after - before - sys.getsizeof(nodes)) / count
+
+def ns_per_node(factory, count):
+    return min(timeit.repeat(factory, number=count, repeat=5)) / count * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Node memory and construction benchmark")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+    print(f"{'node':<16}{'bytes before':>14}{'bytes after':>13}{'ns before':>11}{'ns after':>10}")
+    for name, (legacy, current) in CASES.items():
+        print(f"{name:<16}"
+              f"{bytes_per_node(legacy, args.count):>14.1f}{bytes_per_node(current, args.count):>13.1f}"
+              f"{ns_per_node(legacy, args.count):>11.1f}{ns_per_node(current, args.count):>10.1f}")
+
+if __name__ == "__main__":
+    main()
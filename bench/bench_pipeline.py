@@ -0,0 +1,112 @@
+# Times each stage of the markdown-to-HTML pipeline on a synthetic corpus.
+#   python3 bench/bench_pipeline.py --output bench/results.json
+#   python3 bench/bench_pipeline.py --compare bench/results.json
+# --compare exits with status 1 if any stage got slower than --threshold.
+import argparse, json, logging, os, platform, shutil, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+from corpus import make_corpus, PROFILES
+from inline_markdown import (markdown_to_blocks, block_to_blocktype, text_to_textnodes,
+                             markdown_to_html_node, BlockType)
+from generate_page import gen_page_recursive
+
+TEMPLATE = '<!doctype html><title>{{ Title }}</title><link href="/index.css"><article>{{ Content }}</article>'
+
+def best_of(repeat, function):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def bench_profile(pages, repeat, jobs):
+    size = sum(len(page.encode()) for page in pages)
+    blocks = [block for page in pages for block in markdown_to_blocks(page)]
+    inline = [block for block in blocks if block_to_blocktype(block) != BlockType.CODE]
+    nodes = [markdown_to_html_node(page) for page in pages]
+    stages = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(page) for page in pages],
+        "block_to_blocktype": lambda: [block_to_blocktype(block) for block in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(block) for block in inline],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(page) for page in pages],
+        "to_html": lambda: [node.to_html() for node in nodes],
+    }
+    results = {}
+    for name, function in stages.items():
+        seconds = best_of(repeat, function)
+        results[name] = {"seconds": seconds, "pages_per_s": len(pages) / seconds, "mb_per_s": size / seconds / 1e6}
+    with tempfile.TemporaryDirectory() as root:
+        content, dest = os.path.join(root, "content"), os.path.join(root, "docs")
+        template = os.path.join(root, "template.html")
+        with open(template, "w") as file:
+            file.write(TEMPLATE)
+        for i, page in enumerate(pages):
+            os.makedirs(os.path.join(content, f"page{i}"))
+            with open(os.path.join(content, f"page{i}", "index.md"), "w") as file:
+                file.write(page)
+        def build():
+            shutil.rmtree(dest, ignore_errors=True)
+            os.mkdir(dest)
+            gen_page_recursive(content, template, dest, "/site/", jobs)
+        seconds = best_of(repeat, build)
+        results["gen_page_recursive"] = {"seconds": seconds, "pages_per_s": len(pages) / seconds,
+                                         "mb_per_s": size / seconds / 1e6}
+    return {"pages": len(pages), "bytes": size, "stages": results}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current, threshold):
+    regressions = []
+    for profile, result in current["profiles"].items():
+        for stage, timing in result["stages"].items():
+            old = baseline.get("profiles", {}).get(profile, {}).get("stages", {}).get(stage)
+            if not old:
+                continue
+            change = timing["seconds"] / old["seconds"] - 1
+            marker = "  REGRESSION" if change > threshold else ""
+            print(f"{profile:<12}{stage:<24}{old['seconds'] * 1e3:>10.2f}ms{timing['seconds'] * 1e3:>10.2f}ms{change:>+9.1%}{marker}")
+            if marker:
+                regressions.append((profile, stage, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown-to-HTML pipeline benchmark")
+    parser.add_argument("--pages", type=int, default=5, help="pages per corpus profile")
+    parser.add_argument("--profiles", nargs="*", choices=sorted(PROFILES), help="corpus profiles to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest is reported")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for the full build stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported as a regression (0.10 = 10%%)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    corpus = make_corpus(args.pages, args.seed, args.profiles)
+    results = {"revision": git_revision(), "python": platform.python_version(), "seed": args.seed,
+               "pages_per_profile": args.pages, "profiles": {}}
+    for profile, pages in corpus.items():
+        result = bench_profile(pages, args.repeat, args.jobs)
+        results["profiles"][profile] = result
+        print(f"{profile} ({result['pages']} pages, {result['bytes'] / 1e6:.2f} MB)")
+        for stage, timing in result["stages"].items():
+            print(f"  {stage:<24}{timing['seconds'] * 1e3:>10.2f}ms{timing['pages_per_s']:>10.1f} pages/s{timing['mb_per_s']:>8.2f} MB/s")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Deterministic synthetic markdown corpus for the benchmarks
+import random
+
+WORDS = ("the ring of power was forged in the fires of mount doom by sauron "
+         "while elves dwarves and men each received their own rings of lesser might "
+         "frodo carried it across middle earth with sam at his side").split()
+
+PROFILES = {
+    # name: (paragraphs, words per paragraph, inline markup rate, lists, code blocks)
+    "small": (4, 40, 0.05, 1, 0),
+    "medium": (40, 80, 0.05, 6, 2),
+    "huge": (1500, 120, 0.05, 200, 60),
+    "link_heavy": (60, 60, 0.4, 2, 0),
+    "list_heavy": (10, 30, 0.05, 120, 0),
+    "code_heavy": (15, 40, 0.02, 2, 80),
+}
+
+def sentence(rng, words, markup_rate):
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < markup_rate:
+            kind = rng.randrange(5)
+            if kind == 0:
+                word = f"**{word}**"
+            elif kind == 1:
+                word = f"_{word}_"
+            elif kind == 2:
+                word = f"`{word}`"
+            elif kind == 3:
+                word = f"[{word}](/blog/{rng.choice(WORDS)})"
+            else:
+                word = f"![{word}](/images/{rng.choice(WORDS)}.png)"
+        parts.append(word)
+    return " ".join(parts).capitalize() + "."
+
+def make_page(profile, rng):
+    paragraphs, words, markup_rate, lists, codes = PROFILES[profile]
+    blocks = [f"# {sentence(rng, 5, 0)}"]
+    kinds = ["p"] * paragraphs + ["ul"] * (lists // 2) + ["ol"] * (lists - lists // 2) + ["code"] * codes
+    rng.shuffle(kinds)
+    for i, kind in enumerate(kinds):
+        if i % 10 == 0:
+            blocks.append(f"{'#' * rng.randint(2, 4)} {sentence(rng, 4, 0)}")
+        if kind == "p":
+            blocks.append("\n".join(sentence(rng, words // 4, markup_rate) for _ in range(4)))
+        elif kind == "ul":
+            blocks.append("\n".join(f"- {sentence(rng, 8, markup_rate)}" for _ in range(rng.randint(3, 8))))
+        elif kind == "ol":
+            blocks.append("\n".join(f"{n}. {sentence(rng, 8, markup_rate)}" for n in range(1, rng.randint(3, 10))))
+        else:
+            lines = [f"    call({rng.choice(WORDS)}, {n})" for n in range(rng.randint(3, 20))]
+            blocks.append("```\n" + "\n".join(lines) + "\n```")
+        if i % 25 == 0:
+            blocks.append(f"> {sentence(rng, 12, markup_rate)}\n> {sentence(rng, 12, markup_rate)}")
+    return "\n\n".join(blocks) + "\n"
+
+def make_corpus(pages_per_profile=5, seed=0, profiles=None):
+    # Returns {profile: [markdown, ...]}
+    rng = random.Random(seed)
+    return {profile: [make_page(profile, rng) for _ in range(pages_per_profile)]
+            for profile in (profiles or PROFILES)}
@@ -0,0 +1,56 @@
+import hashlib, os
+from collections import OrderedDict
+
+CACHE_VERSION = b"1" # bump whenever block rendering output changes
+
+class BlockCache:
+    # Block markdown -> rendered HTML fragment. An in-memory LRU in front of an
+    # optional on-disk store shared by worker processes and later builds.
+    def __init__(self, maxsize=4096, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, block):
+        return hashlib.blake2b(CACHE_VERSION + b"\0" + block.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".html")
+
+    def get(self, key):
+        html = self.entries.get(key)
+        if html is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return html
+        if self.directory:
+            try:
+                with open(self._path(key), "r") as file:
+                    html = file.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                self._remember(key, html)
+                return html
+        self.misses += 1
+        return None
+
+    def put(self, key, html):
+        self._remember(key, html)
+        if self.directory:
+            location = self._path(key)
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            temp = f"{location}.{os.getpid()}.tmp"
+            with open(temp, "w") as file:
+                file.write(html)
+            os.replace(temp, location)
+
+    def _remember(self, key, html):
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
@@ -0,0 +1,252 @@
+from static_gen import copy_dir_static, sync_dir_static
+from generate_page import gen_page_recursive, plan_incremental, render_planned, PageErrors
+from manifest import load_manifest, save_manifest, prune_outputs, manifest_path, MANIFEST_DIR
+from site_index import write_site_indexes
+from compress import compress_outputs, remove_siblings
+from images import process_images
+from listings import write_listings, PER_PAGE
+from link_check import (scan_outputs, page_link_targets, manifest_link_targets, find_broken_links,
+                        report_broken_links)
+from output import staging_path, link_tree, sync_filesystem, swap_directory
+from tree import scan_tree, load_snapshot, diff_snapshots
+from contextlib import contextmanager, nullcontext, ExitStack
+import copy, logging, os, shutil
+import generate_page, inline_markdown
+
+class BuildConfig:
+    def __init__(self, static="static", content="content", template="template.html", destination="docs",
+                 basepath="/", jobs=1, static_compare="stat", static_link=False, profile=None,
+                 site_url=None, search_index=False, feed_dir="blog", compress=(), images=False,
+                 image_widths=(), image_cache=".cache/images", explain=False, staging=True, swap="rename",
+                 fsync=True, check_links=False, drafts=False, listings=(), per_page=PER_PAGE, targets=(),
+                 manifest_dir=MANIFEST_DIR):
+        self.static, self.content, self.template = static, content, template
+        self.destination, self.basepath, self.jobs = destination, basepath, jobs
+        self.static_compare, self.static_link = static_compare, static_link
+        self.profile = profile # BuildProfile or None
+        self.site_url = site_url # enables sitemap.xml and the RSS feed of feed_dir
+        self.search_index = search_index
+        self.feed_dir = feed_dir
+        self.compress = compress # precompressed sibling formats to write, e.g. ("gz", "br")
+        self.images = images or bool(image_widths) # add width/height (and srcset) to <img>
+        self.image_widths, self.image_cache = image_widths, image_cache
+        self.explain = explain # log why every page is rebuilt
+        self.staging = staging # build next to destination and swap it in when done, see staged
+        self.swap, self.fsync = swap, fsync
+        self.check_links = check_links
+        self.drafts = drafts # also render pages marked draft: true
+        self.listings, self.per_page = listings, per_page # content directories that get listing pages
+        self.targets = targets # further (basepath, destination) trees built from the same sources
+        self.manifest_dir = manifest_dir
+        self.manifest = None # (read, write) manifest locations, set while staged
+
+    def manifest_locations(self):
+        # Where an incremental build finds the previous manifest and saves its own
+        if self.manifest:
+            return self.manifest
+        location = manifest_path(self.destination, self.manifest_dir)
+        return location, location
+
+    def target_configs(self):
+        # One config per extra target; links are only checked once, for the main one
+        configs = []
+        for basepath, destination in self.targets:
+            target = copy.copy(self)
+            target.basepath, target.destination = basepath, destination
+            target.targets, target.check_links = (), False
+            configs.append(target)
+        return configs
+
+    def phase(self, name):
+        return self.profile.phase(name) if self.profile else nullcontext()
+
+    @property
+    def wants_summaries(self):
+        return bool(self.site_url or self.search_index)
+
+def scan_sources(config):
+    # One snapshot of each source tree per build, shared by every target and stage
+    with config.phase("scan"):
+        return {"static": scan_tree(config.static), "content": scan_tree(config.content)}
+
+def report_source_changes(old_tree, tree):
+    counts = []
+    for name in ("static", "content"):
+        changed, removed = diff_snapshots(old_tree[name], tree[name])
+        counts.append(f"{len(changed)} changed and {len(removed)} removed {name} file(s)")
+    logging.info(f"Since the last build: {', '.join(counts)}")
+
+def write_indexes(config, pages):
+    if config.wants_summaries:
+        with config.phase("site indexes"):
+            write_site_indexes(config.destination, pages, config.basepath, config.site_url,
+                               config.search_index, config.feed_dir)
+
+def prepare_images(config):
+    # Returns the output entries of the resized variants
+    if not config.images:
+        inline_markdown.image_attributes = {}
+        return {}
+    with config.phase("images"):
+        inline_markdown.image_attributes, outputs = process_images(config.static, config.destination,
+                                                                    config.image_cache, config.image_widths)
+    return outputs
+
+def check_links(config, pages=None, entries=None):
+    # Links come from the urls collected while rendering ({page: urls}) or, for
+    # incremental builds, from the manifest page entries. Returns the broken
+    # (page, target) pairs.
+    if not config.check_links:
+        return []
+    with config.phase("link check"):
+        outputs = scan_outputs(config.destination)
+        if pages is not None:
+            targets = page_link_targets(pages, outputs)
+        else:
+            targets = manifest_link_targets(entries, outputs)
+        return report_broken_links(find_broken_links(targets, outputs))
+
+def write_listing_pages(config, pages, entries):
+    # pages: {rel_path: page record with the front matter under "meta"}
+    if not config.listings:
+        prune_outputs(config.destination, entries, {})
+        return {}
+    with config.phase("listings"):
+        return write_listings(config.destination, {rel_path: page["meta"] for rel_path, page in pages.items()},
+                              config.listings, config.template, config.basepath, config.per_page, entries)
+
+def write_compressed(config, entries):
+    if not config.compress:
+        remove_siblings(config.destination, entries)
+        return {}
+    with config.phase("compression"):
+        return compress_outputs(config.destination, entries, config.compress)
+
+def remove_file(location):
+    try:
+        os.remove(location)
+    except FileNotFoundError:
+        pass
+
+@contextmanager
+def staged(config, seed=False):
+    # Yields a copy of config that builds into a staging directory, which
+    # replaces the destination only once the build succeeded, so the served
+    # site is never half-written. seed=True starts from hardlinks of the
+    # current site for incremental builds. The build's manifest is kept
+    # pending next to the current one until the swap, so it always describes
+    # the live site.
+    if not config.staging:
+        yield config
+        return
+    staging = staging_path(config.destination)
+    shutil.rmtree(staging, ignore_errors=True)
+    if seed and os.path.isdir(config.destination):
+        with config.phase("staging"):
+            logging.debug(f"Seeded {staging} with {link_tree(config.destination, staging)} links")
+    location = manifest_path(config.destination, config.manifest_dir)
+    pending = location + ".pending"
+    target = copy.copy(config)
+    target.destination, target.manifest = staging, (location, pending)
+    try:
+        yield target
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        remove_file(pending)
+        raise
+    with config.phase("swap"):
+        if config.fsync:
+            logging.debug(f"Flushed {staging} with {sync_filesystem(staging)}")
+        swap_directory(staging, config.destination, config.swap)
+    if os.path.exists(pending):
+        os.replace(pending, location)
+
+def build_full(config, tree=None):
+    # Both return the broken links found with config.check_links. Every target
+    # is staged and swapped in only once all of them built. tree: snapshots of
+    # the source trees if already taken, see scan_sources.
+    if tree is None:
+        tree = scan_sources(config)
+    for target_config in (config, *config.target_configs()):
+        # A full build records no manifest; the next incremental build starts over
+        remove_file(target_config.manifest_locations()[0])
+    with ExitStack() as stack:
+        target = stack.enter_context(staged(config))
+        others = [stack.enter_context(staged(other)) for other in config.target_configs()]
+        return render_full(target, others, tree)
+
+def build_incremental(config, tree=None):
+    # Each target keeps its own manifest and so its own set of stale pages; as
+    # with build_full, all of them are swapped in only once every one built
+    if tree is None:
+        tree = scan_sources(config)
+    with ExitStack() as stack:
+        target = stack.enter_context(staged(config, seed=True))
+        others = [stack.enter_context(staged(other, seed=True)) for other in config.target_configs()]
+        return render_incremental(target, others, tree)
+
+def render_full(config, others=(), tree=None):
+    # others: configs of the extra targets, whose pages come from the same parse.
+    # tree: snapshots of the source trees, see scan_sources.
+    generate_page.collect_summaries = config.wants_summaries
+    targets = (config, *others)
+    if tree is None:
+        tree = scan_sources(config)
+    with config.phase("static copy"):
+        for target in targets:
+            copy_dir_static(config.static, target.destination, tree["static"])
+    for target in targets:
+        prepare_images(target)
+    pages = gen_page_recursive(config.content, config.template, config.destination, config.basepath,
+                               config.jobs, config.profile, config.drafts,
+                               [(other.destination, other.basepath) for other in others], tree["content"])
+    for target in targets:
+        write_listing_pages(target, pages, {})
+        write_indexes(target, pages)
+        write_compressed(target, {})
+    return check_links(config, pages={rel_path: info["links"] for rel_path, info in pages.items()})
+
+def record_outputs(config, manifest, static_entries, page_entries, tree):
+    prune_outputs(config.destination, {**manifest["static"], **manifest["pages"]},
+                  {**static_entries, **page_entries})
+    manifest["static"], manifest["pages"], manifest["tree"] = static_entries, page_entries, tree
+    save_manifest(config.manifest_locations()[1], manifest)
+
+def render_incremental(config, others=(), tree=None):
+    # others: configs of the extra targets; a page stale in all of them and in
+    # config is parsed once (see render_planned). tree: see render_full.
+    generate_page.collect_summaries = config.wants_summaries
+    targets = (config, *others)
+    if tree is None:
+        tree = scan_sources(config)
+    manifests, static_tables, plans = [], [], []
+    for target in targets:
+        manifest = load_manifest(target.manifest_locations()[0])
+        old_tree = {name: load_snapshot(snapshot) for name, snapshot in manifest["tree"].items()}
+        report_source_changes(old_tree, tree)
+        with config.phase("static copy"):
+            static_entries = sync_dir_static(config.static, target.destination, manifest["static"],
+                                             config.static_compare, config.static_link, tree=tree["static"])
+        static_entries.update(prepare_images(target))
+        plans.append((target.basepath, plan_incremental(config.content, config.template, target.destination,
+                                                        target.basepath, manifest["pages"], static=static_entries,
+                                                        explain_rebuilds=config.explain, drafts=config.drafts,
+                                                        tree=tree["content"], old_tree=old_tree["content"])))
+        manifests.append(manifest)
+        static_tables.append(static_entries)
+    page_tables, errors = render_planned(plans, config.template, config.jobs, config.profile)
+    for target, manifest, static_entries, page_entries in zip(targets, manifests, static_tables, page_tables):
+        record_outputs(target, manifest, static_entries, page_entries, tree)
+    if errors:
+        # The pages that did build are recorded; any other error leaves the
+        # previous manifests in place, so the next build starts over from them
+        raise PageErrors(errors)
+    broken = []
+    for target, manifest, page_entries in zip(targets, manifests, page_tables):
+        manifest["listings"] = write_listing_pages(target, page_entries, manifest["listings"])
+        write_indexes(target, {rel_path: {**entry["info"], "source": entry["source"]}
+                               for rel_path, entry in page_entries.items() if "info" in entry})
+        manifest["compressed"] = write_compressed(target, manifest["compressed"])
+        save_manifest(target.manifest_locations()[1], manifest)
+        broken += check_links(target, entries=page_entries)
+    return broken
@@ -0,0 +1,44 @@
+import argparse, json, socket, sys
+
+# Deliberately imports nothing from the build, so a request costs little more
+# than interpreter startup: python3 src/client.py build
+SOCKET_PATH = ".cache/build.sock"
+
+def send_request(request, socket_path=SOCKET_PATH):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as stream:
+            stream.write((json.dumps(request) + "\n").encode())
+            stream.flush()
+            line = stream.readline()
+    if not line:
+        raise Exception("The build daemon closed the connection without answering")
+    return json.loads(line)
+
+def client_main(argv):
+    parser = argparse.ArgumentParser(prog="client.py", description="Send a request to a running build daemon")
+    parser.add_argument("command", choices=("build", "rebuild", "status", "shutdown"))
+    parser.add_argument("paths", nargs="*", help="the source files changed since the last build (rebuild only)")
+    parser.add_argument("--full", action="store_true", help="build: start from scratch instead of incrementally")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket of the daemon")
+    args = parser.parse_args(argv)
+    request = {"command": args.command}
+    if args.command == "build":
+        request["full"] = args.full
+    elif args.command == "rebuild":
+        request["paths"] = args.paths
+    try:
+        response = send_request(request, args.socket)
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"No build daemon listening on {args.socket}; start one with: python3 src/main.py daemon", file=sys.stderr)
+        sys.exit(2)
+    for line in response.pop("log"):
+        print(line, file=sys.stderr)
+    if "error" in response:
+        print(response.pop("error"), file=sys.stderr)
+    print(json.dumps(response))
+    if not response["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    client_main(sys.argv[1:])
@@ -0,0 +1,95 @@
+import gzip, logging, os
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_file
+try:
+    import brotli
+except ImportError: # optional: pip install brotli
+    brotli = None
+
+TEXT_EXTENSIONS = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt", ".map")
+COMPRESS_JOBS = 8
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output byte-for-byte reproducible
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def brotli_bytes(data):
+    return brotli.compress(data, quality=11)
+
+COMPRESSORS = {"gz": gzip_bytes, "br": brotli_bytes}
+
+def available_formats(formats=("gz", "br")):
+    if "br" in formats and brotli is None:
+        logging.warning("Brotli siblings need the brotli package (pip install brotli); not writing .br files")
+    return tuple(fmt for fmt in formats if fmt != "br" or brotli is not None)
+
+def find_text_outputs(destination):
+    outputs = []
+    for dirpath, _, filenames in os.walk(destination):
+        for filename in filenames:
+            if filename.endswith(TEXT_EXTENSIONS):
+                location = os.path.join(dirpath, filename)
+                outputs.append(os.path.relpath(location, destination).replace(os.sep, "/"))
+    return sorted(outputs)
+
+def compress_file(location, formats):
+    # Writes location.gz / location.br next to it; returns {format: compressed size}.
+    # A sibling that would not be smaller than the original is not kept.
+    with open(location, "rb") as file:
+        data = file.read()
+    sizes = {}
+    for fmt in formats:
+        compressed = COMPRESSORS[fmt](data)
+        sibling = f"{location}.{fmt}"
+        if len(compressed) >= len(data):
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        temp = sibling + ".tmp"
+        with open(temp, "wb") as file:
+            file.write(compressed)
+        os.replace(temp, sibling)
+        sizes[fmt] = len(compressed)
+    return len(data), sizes
+
+def compress_outputs(destination, entries, formats=("gz", "br"), jobs=COMPRESS_JOBS):
+    # entries: {rel_path: {"hash", "formats"}} from the previous run. Files whose
+    # content hash and formats are unchanged keep their existing siblings.
+    formats = available_formats(formats)
+    if not formats:
+        remove_siblings(destination, entries)
+        return {}
+    new_entries, work = {}, []
+    for rel_path in find_text_outputs(destination):
+        location = os.path.join(destination, rel_path)
+        digest = hash_file(location)
+        old = entries.get(rel_path)
+        if (old and old["hash"] == digest and old["formats"] == list(formats)
+                and all(os.path.exists(f"{location}.{fmt}") for fmt in old.get("sizes", {}))):
+            new_entries[rel_path] = old
+        else:
+            work.append((rel_path, digest))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda item: compress_file(os.path.join(destination, item[0]), formats), work)
+        for (rel_path, digest), (size, sizes) in zip(work, results):
+            new_entries[rel_path] = {"hash": digest, "formats": list(formats), "size": size, "sizes": sizes}
+    remove_siblings(destination, set(entries) - set(new_entries))
+    report_savings(new_entries, len(work), formats)
+    return new_entries
+
+def remove_siblings(destination, rel_paths):
+    # Drop the .gz/.br files of outputs that are gone or no longer compressed
+    for rel_path in rel_paths:
+        for fmt in COMPRESSORS:
+            try:
+                os.remove(os.path.join(destination, f"{rel_path}.{fmt}"))
+            except FileNotFoundError:
+                pass
+
+def report_savings(entries, compressed, formats):
+    original = sum(entry["size"] for entry in entries.values())
+    parts = []
+    for fmt in formats:
+        saved = sum(entry["size"] - entry["sizes"][fmt] for entry in entries.values() if fmt in entry["sizes"])
+        parts.append(f"{fmt}: {saved:,} bytes saved ({saved / original:.0%})" if original else f"{fmt}: 0 bytes")
+    logging.info(f"Compressed {compressed} of {len(entries)} text outputs ({original:,} bytes); " + ", ".join(parts))
@@ -0,0 +1,121 @@
+import json, logging, os, socket, socketserver, time, traceback
+from build import build_full, build_incremental, scan_sources
+from generate_page import PageErrors
+from tree import update_snapshot
+from client import SOCKET_PATH
+import generate_page
+
+# Protocol: the client connects, sends one JSON object on one line and gets one
+# JSON line back.
+#   {"command": "build", "full": false}  incremental (or full) build of the whole site
+#   {"command": "rebuild", "paths": [...]}  incremental build that stats only these source paths
+#   {"command": "status"}, {"command": "shutdown"}
+# Every response has "ok" and "log" (the INFO and above lines logged while handling it).
+
+class LogCapture(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+class BuildDaemon:
+    # Keeps one process, and with it the template, block, metadata and hash
+    # caches, alive between builds; with jobs > 1 also one pool of workers
+    # with their own block caches
+    def __init__(self, config):
+        self.config = config
+        self.running = True
+        self.builds = 0
+        self.tree = None # the source snapshots of the last build, see scan_sources
+
+    def dispatch(self, request):
+        capture = LogCapture()
+        root = logging.getLogger()
+        root.addHandler(capture)
+        try:
+            response = self.handle(request)
+        except PageErrors as e:
+            response = {"ok": False, "error": str(e)}
+        except Exception:
+            response = {"ok": False, "error": traceback.format_exc()}
+        finally:
+            root.removeHandler(capture)
+        response["log"] = capture.lines
+        return response
+
+    def handle(self, request):
+        command = request.get("command")
+        start = time.perf_counter()
+        if command == "build":
+            tree = scan_sources(self.config)
+            broken = (build_full if request.get("full") else build_incremental)(self.config, tree)
+            self.builds += 1
+            self.tree = tree
+            return {"ok": not broken, "broken": broken, "seconds": time.perf_counter() - start}
+        if command == "rebuild":
+            # A whole incremental build, so targets, listings, site indexes and
+            # compressed siblings follow, but without walking the source trees:
+            # only the given paths can have changed since the last build
+            if self.tree is None:
+                raise Exception("Nothing built yet; send a build request first")
+            paths = request.get("paths", ())
+            self.tree = {name: update_snapshot(self.tree[name], root, paths)
+                         for name, root in (("static", self.config.static), ("content", self.config.content))}
+            broken = build_incremental(self.config, self.tree)
+            return {"ok": not broken, "broken": broken, "seconds": time.perf_counter() - start}
+        if command == "status":
+            cache = generate_page.block_cache
+            return {"ok": True, "pid": os.getpid(), "builds": self.builds,
+                    "block_cache": cache and {"hits": cache.hits, "misses": cache.misses, "size": len(cache.entries)}}
+        if command == "shutdown":
+            self.running = False
+            return {"ok": True}
+        raise Exception(f"Unknown command {command!r}")
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One request per connection: the client's end may also be held open by
+        # worker processes forked meanwhile, so never wait for it to close
+        line = self.rfile.readline()
+        if not line:
+            return # a probe from daemon_running, which sends nothing
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {"ok": False, "error": f"Invalid request: {e}", "log": []}
+        else:
+            response = self.server.build_daemon.dispatch(request)
+        self.wfile.write((json.dumps(response) + "\n").encode())
+
+def daemon_running(socket_path=SOCKET_PATH):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+def serve_daemon(config, socket_path=SOCKET_PATH):
+    # Handles one request at a time until a shutdown request or Ctrl-C
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        if daemon_running(socket_path):
+            raise Exception(f"A build daemon is already listening on {socket_path}")
+        os.unlink(socket_path) # left behind by a daemon that died
+    build_daemon = BuildDaemon(config)
+    generate_page.keep_workers = True
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        server.build_daemon = build_daemon
+        logging.info(f"Build daemon listening on {socket_path}")
+        try:
+            while build_daemon.running:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+            generate_page.keep_workers = False
+            generate_page.shutdown_workers()
@@ -0,0 +1,105 @@
+import json, posixpath
+from urllib.parse import urlsplit
+from manifest import hash_bytes, hash_file_cached
+
+# Every page output records its inputs as {"kind:name": fingerprint}, e.g.
+#   "source:content/blog/tom/index.md": content hash
+#   "template:template.html": content hash
+#   "config:basepath": "/site-generator/"
+#   "link:images/tom.png": "static" (plus the image attributes baked into <img>)
+#   "link:blog/tom/index.html": "page", or "missing" for a broken link
+# An output is dirty exactly when one of its recorded fingerprints differs from
+# the current one, and the differing keys are the reasons it gets rebuilt.
+
+def resolve_link(url, page_rel):
+    # Output path (relative to the destination) a link from page_rel points at,
+    # or None for external links, fragments and the like
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    if parts.path.startswith("/"):
+        path = parts.path[1:]
+    else:
+        path = posixpath.join(posixpath.dirname(page_rel), parts.path)
+    path = posixpath.normpath(path)
+    if path == ".":
+        path = ""
+    if path.startswith("../"):
+        return None
+    return path
+
+def link_target(path, outputs):
+    # /blog/tom may be served from blog/tom, blog/tom.html or blog/tom/index.html
+    for candidate in (path, path + ".html", posixpath.join(path, "index.html")):
+        if candidate in outputs:
+            return candidate
+    return path
+
+def link_targets(links, page_rel, outputs):
+    # Distinct output paths the urls of page_rel point at, found or not
+    return sorted({link_target(path, outputs) for path in (resolve_link(url, page_rel) for url in links)
+                   if path is not None})
+
+def link_inputs(links, page_rel, state):
+    return {f"link:{target}": state.fingerprint(f"link:{target}")
+            for target in link_targets(links, page_rel, state.outputs)}
+
+class InputState:
+    # Current fingerprint of any input key, computed at most once per build
+    def __init__(self, basepath, pages, static, image_attributes=None):
+        self.config = {"basepath": basepath}
+        self.pages, self.static = set(pages), set(static)
+        self.outputs = self.pages | self.static
+        self.image_attributes = image_attributes or {}
+        self.memo = {}
+
+    def fingerprint(self, key):
+        if key not in self.memo:
+            kind, name = key.split(":", 1)
+            if kind in ("source", "template"):
+                try:
+                    self.memo[key] = hash_file_cached(name)
+                except FileNotFoundError:
+                    self.memo[key] = "missing" # e.g. a template the page no longer uses was deleted
+            elif kind == "config":
+                self.memo[key] = self.config.get(name)
+            elif kind == "link":
+                self.memo[key] = self.link_state(name)
+            else:
+                self.memo[key] = None # unknown kinds are always dirty
+        return self.memo[key]
+
+    def assume(self, key, fingerprint):
+        # Take the fingerprint recorded by an earlier build for an input known
+        # to be unchanged (see tree) instead of recomputing it
+        self.memo.setdefault(key, fingerprint)
+
+    def link_state(self, target):
+        if target in self.pages:
+            return "page"
+        if target not in self.static:
+            return "missing"
+        attributes = self.image_attributes.get("/" + target)
+        if attributes:
+            return "static " + hash_bytes(json.dumps(attributes, sort_keys=True).encode())
+        return "static"
+
+def explain(old_inputs, state):
+    # Reasons an output recorded with old_inputs is out of date, or [] if it is not
+    if old_inputs is None:
+        return ["new output"]
+    reasons = []
+    for key, fingerprint in old_inputs.items():
+        current = state.fingerprint(key)
+        if current != fingerprint:
+            kind, name = key.split(":", 1)
+            if kind == "link":
+                reasons.append(f"link target {name} is now {current.split()[0]} (was {fingerprint.split()[0]})"
+                               if current.split()[0] != fingerprint.split()[0] else f"image {name} changed")
+            elif kind == "config":
+                reasons.append(f"{name} changed from {fingerprint!r} to {current!r}")
+            elif current == "missing":
+                reasons.append(f"{kind} {name} was removed")
+            else:
+                reasons.append(f"{kind} {name} changed")
+    return reasons
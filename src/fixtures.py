@@ -0,0 +1,43 @@
+import os, tempfile, unittest
+from build import BuildConfig
+
+
+class TempDirTestCase(unittest.TestCase):
+    # Every test gets a fresh temporary directory, self.root. Paths given to the
+    # helpers are relative to it; absolute paths are used as they are.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def write(self, rel_path, data, mtime_ns=None):
+        location = self.path(rel_path)
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        with open(location, "wb" if isinstance(data, bytes) else "w") as file:
+            file.write(data)
+        if mtime_ns is not None:
+            os.utime(location, ns=(mtime_ns, mtime_ns))
+        return location
+
+    def edit(self, rel_path, data):
+        # write, with the mtime a second ahead so that even filesystems with
+        # coarse timestamps show the change
+        location = self.write(rel_path, data)
+        stat = os.stat(location)
+        os.utime(location, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return location
+
+    def read(self, rel_path, mode="r"):
+        with open(self.path(rel_path), mode) as file:
+            return file.read()
+
+    def site_config(self, **options):
+        # A site of static/, content/ and template.html built into docs/, with
+        # its manifest kept in the temporary directory as well
+        return BuildConfig(self.path("static"), self.path("content"), self.path("template.html"),
+                           self.path("docs"), manifest_dir=self.path("manifests"), **options)
@@ -0,0 +1,77 @@
+import datetime, re
+
+FENCE = "---"
+LIST_FIELDS = ("tags",)
+BOOL_FIELDS = ("draft",)
+
+def parse_list(value):
+    # "a, b" or "[a, b]"
+    return [item.strip().strip("'\"") for item in value.strip().strip("[]").split(",") if item.strip()]
+
+def parse_bool(value):
+    return value.strip().lower() in ("true", "yes", "on", "1")
+
+DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(.*)")
+
+def parse_date(value):
+    # ISO 8601 date or date and time, also with one-digit months and days; a
+    # time without an offset is taken as UTC. None if it is not a date.
+    match = DATE_RE.fullmatch(value.strip())
+    if not match:
+        return None
+    year, month, day, rest = match.groups()
+    try:
+        date = datetime.datetime.fromisoformat(f"{year}-{int(month):02d}-{int(day):02d}{rest}")
+    except ValueError:
+        return None
+    return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+
+def split_front_matter(markdown):
+    # Optional "key: value" header between two --- lines at the very top of a page.
+    # Returns (metadata dict, remaining markdown); pages without one are unchanged.
+    if not markdown.startswith(FENCE + "\n"):
+        return {}, markdown
+    end = markdown.find("\n" + FENCE + "\n", len(FENCE))
+    if end == -1:
+        if not markdown.rstrip().endswith("\n" + FENCE):
+            return {}, markdown
+        end = markdown.rstrip().rfind("\n" + FENCE)
+    metadata = {}
+    for line in markdown[len(FENCE) + 1:end].split("\n"):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            raise Exception(f"Invalid front matter line: '{line}'")
+        key = key.strip().lower()
+        if key in LIST_FIELDS:
+            metadata[key] = parse_list(value)
+        elif key in BOOL_FIELDS:
+            metadata[key] = parse_bool(value)
+        else:
+            metadata[key] = value.strip()
+    # The date stays as written, for display; everything that orders pages by
+    # date uses this POSIX timestamp instead, so listings and the feed agree
+    date = parse_date(metadata["date"]) if "date" in metadata else None
+    if date is not None:
+        metadata["timestamp"] = date.timestamp()
+    return metadata, markdown[end + len(FENCE) + 2:]
+
+def read_front_matter(file):
+    # Same as split_front_matter, but reads only the header lines of an open text
+    # file and leaves it positioned at the start of the body
+    position = file.tell()
+    if file.readline() != FENCE + "\n":
+        file.seek(position)
+        return {}
+    lines = []
+    while True:
+        line = file.readline()
+        if not line:
+            file.seek(position)
+            return {}
+        if line.rstrip("\n") == FENCE:
+            break
+        lines.append(line)
+    metadata, _ = split_front_matter(FENCE + "\n" + "".join(lines) + FENCE + "\n")
+    return metadata
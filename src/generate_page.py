@@ -1,41 +1,438 @@
 from inline_markdown import (markdown_to_html_node,
-                              markdown_to_blocks)
-import os, logging
+                              markdown_to_blocks,
+                              block_to_blocktype,
+                              block_to_html_node,
+                              scan_blocks,
+                              iter_markdown_html)
+from htmlnode import ParentNode, ROOT_MARKER
+from profiling import PageTimer
+from block_cache import BlockCache
+from front_matter import split_front_matter, read_front_matter
+from template import load_template, resolve_template
+from site_index import PageSummary
+from depgraph import InputState, explain, link_inputs
+from output import open_output
+from manifest import remove_empty_parents
+from tree import scan_tree, output_dirs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import inline_markdown
+import os, logging, traceback
 
-logging.basicConfig(level=logging.INFO)
+block_cache = None # per-process BlockCache, see configure_block_cache
+stream_threshold = 8 << 20 # sources larger than this many bytes are rendered by generate_page_streaming
+collect_summaries = False # also return title/excerpt/search tokens of each page for site_index
+keep_workers = False # reuse one worker pool, and so the workers' block caches, across builds (see daemon)
+_pool = None # (executor, jobs, worker settings) kept while keep_workers is set
+
+def configure_block_cache(maxsize=4096, directory=None):
+    # Also used as the worker initializer so every process gets its own LRU
+    global block_cache
+    block_cache = BlockCache(maxsize, directory) if maxsize or directory else None
+    return block_cache
+
+def _worker_settings():
+    return ((block_cache.maxsize, block_cache.directory) if block_cache else (0, None), stream_threshold,
+            collect_summaries, inline_markdown.image_attributes)
+
+def _init_worker(cache_settings, threshold, summaries, image_attributes):
+    global stream_threshold, collect_summaries
+    configure_block_cache(*cache_settings)
+    stream_threshold, collect_summaries = threshold, summaries
+    inline_markdown.image_attributes = image_attributes
+
+def worker_pool(jobs):
+    # A process pool whose workers run with the current settings. With
+    # keep_workers it outlives the build and is only replaced when jobs or the
+    # settings change; otherwise the caller shuts it down.
+    global _pool
+    settings = _worker_settings()
+    if _pool is not None and _pool[1:] == (jobs, settings):
+        return _pool[0]
+    shutdown_workers()
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=settings)
+    if keep_workers:
+        _pool = (executor, jobs, settings)
+    return executor
+
+def shutdown_workers():
+    global _pool
+    if _pool is not None:
+        _pool[0].shutdown()
+        _pool = None
+
+class PageInfo:
+    # What rendering learns about a page, fed one block-level node at a time:
+    # the urls it links to (for the dependency graph) and, with collect_summaries,
+    # its site index summary
+    def __init__(self):
+        self.links = set()
+        self.summary = PageSummary() if collect_summaries else None
+
+    def add(self, node):
+        self.links.update(node.iter_urls())
+        if self.summary is not None:
+            self.summary.add(node)
+
+    def to_dict(self, title, metadata):
+        info = {"links": sorted(self.links)}
+        if self.summary is not None:
+            info.update(self.summary.to_dict(title, metadata))
+        return info
+
+def summarize(nodes, title, metadata):
+    info = PageInfo()
+    for node in nodes:
+        info.add(node)
+    return info.to_dict(title, metadata)
 
 def open_file(location):
     with open(location, "r") as file:
         return file.read()
     
 def write_file(location, content):
-    with open(location, "w") as file:
+    with open_output(location) as file:
         file.write(content)
 
-def extract_title(markdown):
-    for block in markdown_to_blocks(markdown):
-        if block.startswith("# "):
-            return block.lstrip("# ")
+def extract_title(markdown, metadata=None):
+    # The front matter title wins over the first heading
+    if metadata and metadata.get("title"):
+        return metadata["title"]
+    return extract_title_lines(markdown.split("\n"))
+
+def extract_title_lines(lines):
+    # Stops reading at the first top-level heading
+    for block in scan_blocks(lines):
+        if block.text.startswith("# "):
+            return block.text.lstrip("# ")
         
-def generate_page(from_path, template_path, dest_path, basepath):
-    logging.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    markdown = open_file(from_path)
-    template = open_file(template_path)
-    node = markdown_to_html_node(markdown)
-    title = extract_title(markdown)
-    template = template.replace("{{ Title }}", title).replace("{{ Content }}", node.to_html()).replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
-    write_file(dest_path, template)
+def generate_page(from_path, template_path, dest_path, basepath, timer=None):
+    logging.debug(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    if timer is not None:
+        return generate_page_timed(from_path, template_path, dest_path, basepath, timer)
+    if os.path.getsize(from_path) > stream_threshold:
+        return generate_page_streaming(from_path, template_path, dest_path, basepath)
+    metadata, markdown = split_front_matter(open_file(from_path))
+    template = load_template(resolve_template(template_path, metadata.get("template")), basepath)
+    node = markdown_to_html_node(markdown, block_cache)
+    title = extract_title(markdown, metadata)
+    # Stream the body straight into the output instead of building the page string
+    with open_output(dest_path) as file:
+        template.write_to(file, Title=title, Content=node.iter_html(basepath))
+    return summarize(node.children, title, metadata)
+
+def generate_page_streaming(from_path, template_path, dest_path, basepath):
+    # Same output as generate_page, but the source is read line by line and each
+    # block is written out as soon as it is rendered, so peak memory is bounded
+    # by the largest block rather than the document. Without a front matter
+    # title, the title needs a first pass, which stops at the first heading.
+    with open(from_path, "r") as source:
+        metadata = read_front_matter(source)
+        title = metadata.get("title")
+        if not title:
+            body = source.tell()
+            title = extract_title_lines(source)
+            source.seek(body)
+        template = load_template(resolve_template(template_path, metadata.get("template")), basepath)
+        info = PageInfo()
+        with open_output(dest_path) as file:
+            template.write_to(file, Title=title, Content=iter_markdown_html(source, basepath, block_cache, info.add))
+    return info.to_dict(title, metadata)
+
+def generate_page_targets(from_path, template_path, outputs, timer=None):
+    # outputs: [(dest_path, basepath)]. The page is parsed and rendered once, with
+    # ROOT_MARKER standing in for the basepath, and each chunk is written to every
+    # output with only the marked URL positions differing.
+    if len(outputs) == 1:
+        return generate_page(from_path, template_path, *outputs[0], timer)
+    logging.debug(f"Generating page from {from_path} to {len(outputs)} targets using {template_path}")
+    with open(from_path, "r") as source:
+        metadata = read_front_matter(source)
+        title = metadata.get("title")
+        if not title:
+            body = source.tell()
+            title = extract_title_lines(source)
+            source.seek(body)
+        template = load_template(resolve_template(template_path, metadata.get("template")), ROOT_MARKER)
+        info = PageInfo()
+        files = [open_output(dest_path) for dest_path, _ in outputs]
+        try:
+            for chunk in template.iter_render(Title=title, Content=iter_markdown_html(source, ROOT_MARKER, block_cache,
+                                                                                      info.add)):
+                if ROOT_MARKER in chunk:
+                    parts = chunk.split(ROOT_MARKER)
+                    for file, (_, basepath) in zip(files, outputs):
+                        file.write(basepath.join(parts))
+                else:
+                    for file in files:
+                        file.write(chunk)
+        finally:
+            for file in files:
+                file.close()
+    if timer is not None:
+        timer.lap("render")
+    return info.to_dict(title, metadata)
+
+def generate_page_timed(from_path, template_path, dest_path, basepath, timer):
+    # Same output as generate_page, with each phase run to completion so that
+    # timer can attribute wall time to it
+    metadata, markdown = split_front_matter(open_file(from_path))
+    template = load_template(resolve_template(template_path, metadata.get("template")), basepath)
+    timer.lap("read")
+    blocks = markdown_to_blocks(markdown)
+    timer.lap("block split")
+    block_types = [block_to_blocktype(block) for block in blocks]
+    timer.lap("block classification")
+    node = ParentNode("div", [block_to_html_node(block, block_type) for block, block_type in zip(blocks, block_types)])
+    title = extract_title(markdown, metadata)
+    timer.lap("inline parsing")
+    body = list(node.iter_html(basepath))
+    timer.lap("serialization")
+    page = template.render(Title=title, Content=body)
+    timer.lap("templating")
+    write_file(dest_path, page)
+    timer.lap("write")
+    return summarize(node.children, title, metadata)
     
-def gen_page_recursive(source, template, destination, basepath):
-    files = os.listdir(source)
-    logging.info(f"Searching for MD files in {source}")
-    for file in files:
-        logging.info(f"File name: {file}, isDir: {os.path.isdir(os.path.join(source, file))}")
-        if os.path.isdir(os.path.join(source, file)):
-            if file not in os.listdir(destination):
-                os.mkdir(os.path.join(destination, file))
-            gen_page_recursive(os.path.join(source, file), template, os.path.join(destination, file), basepath)
-        elif file.endswith(".md"):
-            html = file.replace("md","html")
-            generate_page(os.path.join(source, file), template, os.path.join(destination, html), basepath)
-    return
\ No newline at end of file
+class PageErrors(Exception):
+    def __init__(self, errors):
+        self.errors = errors # list of (source path, formatted traceback)
+        super().__init__(f"{len(errors)} page(s) failed to generate: " + ", ".join(path for path, _ in errors))
+
+def collect_pages(source, destination, tree=None):
+    # (markdown path, html path) pairs of the content tree in a stable order,
+    # with their output directories created under destination. tree: snapshot
+    # of source (see tree.scan_tree), taken here if not given.
+    if tree is None:
+        tree = scan_tree(source)
+    logging.debug(f"Found {len(tree)} files in {source}")
+    rel_paths = [rel_path for rel_path in tree if rel_path.endswith(".md")]
+    output_dirs(destination, rel_paths)
+    return [(os.path.join(source, rel_path), os.path.join(destination, rel_path[:-3] + ".html"))
+            for rel_path in rel_paths]
+
+_page_metadata = {} # path -> (stat key, metadata), kept for the life of the process
+
+def read_page_metadata(location):
+    # Front matter plus the title, reading no further than the first heading
+    # (and only the header when the front matter has a title). Unchanged files
+    # are not read again by the same process.
+    stat = os.stat(location)
+    key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cached = _page_metadata.get(location)
+    if cached is not None and cached[0] == key:
+        return dict(cached[1])
+    with open(location, "r") as file:
+        metadata = read_front_matter(file)
+        if not metadata.get("title"):
+            metadata["title"] = extract_title_lines(file)
+    metadata.setdefault("tags", [])
+    metadata.setdefault("draft", False)
+    _page_metadata[location] = (key, metadata)
+    return dict(metadata)
+
+def collect_metadata(pages, root, known=None):
+    # Metadata index {output path relative to root: metadata} of (markdown, html)
+    # pairs; pages in known (same keys) are taken from there instead of read
+    known = known or {}
+    index = {}
+    for from_path, dest_path in pages:
+        rel_path = os.path.relpath(dest_path, root).replace(os.sep, "/")
+        index[rel_path] = dict(known[rel_path]) if rel_path in known else read_page_metadata(from_path)
+    return index
+
+def drop_drafts(pages, index, root, drafts=False):
+    # Pages without draft: true (all of them with drafts=True), before any rendering
+    if drafts:
+        return pages
+    kept = []
+    for from_path, dest_path in pages:
+        if index[os.path.relpath(dest_path, root).replace(os.sep, "/")]["draft"]:
+            logging.debug(f"Skipping draft {from_path}")
+            remove_empty_parents(root, dest_path) # collect_pages created its directory
+        else:
+            kept.append((from_path, dest_path))
+    return kept
+
+def _generate_one(job):
+    from_path, template_path, outputs, profiled = job
+    dest_path = outputs[0][0]
+    timer = PageTimer() if profiled else None
+    try:
+        info = generate_page_targets(from_path, template_path, outputs, timer)
+    except Exception:
+        return from_path, dest_path, traceback.format_exc(), None, None, None
+    return from_path, dest_path, None, timer and timer.spans, os.getpid(), info
+
+def _collect_results(results, profile, infos):
+    errors = []
+    for path, dest_path, error, spans, pid, info in results:
+        if error is not None:
+            errors.append((path, error))
+            continue
+        if profile is not None:
+            profile.add_page(path, spans, pid)
+        infos[dest_path] = info
+    return errors
+
+def generate_pages(pages, template, basepath, jobs=1, profile=None, extra_outputs=None):
+    # Returns {dest_path: page info}, see PageInfo. extra_outputs: {dest_path:
+    # [(path, basepath)]} of other targets rendered from the same parse.
+    extra_outputs = extra_outputs or {}
+    work = [(from_path, template, ((dest_path, basepath), *extra_outputs.get(dest_path, ())), profile is not None)
+            for from_path, dest_path in pages]
+    infos = {}
+    if jobs == 1 or len(work) < 2:
+        errors = _collect_results(map(_generate_one, work), profile, infos)
+    else:
+        executor = worker_pool(jobs)
+        try:
+            chunksize = max(1, len(work) // (jobs * 4))
+            errors = _collect_results(executor.map(_generate_one, work, chunksize=chunksize), profile, infos)
+        except BrokenProcessPool:
+            shutdown_workers() # a kept pool must not be reused
+            raise
+        finally:
+            if not keep_workers:
+                executor.shutdown()
+    for path, error in errors:
+        logging.error(f"Failed to generate {path}:\n{error}")
+    if errors:
+        raise PageErrors(errors)
+    return infos
+
+def gen_page_recursive(source, template, destination, basepath, jobs=1, profile=None, drafts=False, targets=(),
+                       tree=None):
+    # Returns page infos, with the page's front matter under "meta", keyed by
+    # output path relative to destination. targets: further (destination,
+    # basepath) trees that get the same pages from the same parse. tree:
+    # snapshot of source, see collect_pages.
+    pages = collect_pages(source, destination, tree)
+    index = collect_metadata(pages, destination)
+    pages = drop_drafts(pages, index, destination, drafts)
+    extra_outputs = {}
+    for _, dest_path in pages:
+        rel_path = os.path.relpath(dest_path, destination)
+        extra_outputs[dest_path] = [(os.path.join(root, rel_path), target_basepath) for root, target_basepath in targets]
+        for location, _ in extra_outputs[dest_path]:
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+    infos = generate_pages(pages, template, basepath, jobs, profile, extra_outputs)
+    sources = dict((dest_path, from_path) for from_path, dest_path in pages)
+    result = {}
+    for dest_path, info in infos.items():
+        rel_path = os.path.relpath(dest_path, destination).replace(os.sep, "/")
+        result[rel_path] = {**info, "source": sources[dest_path], "meta": index[rel_path]}
+    return result
+
+def unchanged_entries(entries, source, tree, old_tree):
+    # The page entries whose source file is in both snapshots with the same state
+    unchanged = {}
+    for rel_path, entry in entries.items():
+        source_rel = os.path.relpath(entry["source"], source).replace(os.sep, "/")
+        if source_rel in tree and old_tree.get(source_rel) == tree[source_rel]:
+            unchanged[rel_path] = entry
+    return unchanged
+
+def plan_incremental(source, template, destination, basepath, entries, root=None, static=(),
+                     explain_rebuilds=False, drafts=False, tree=None, old_tree=None):
+    # entries: manifest "pages" table from the previous build, keyed by output path
+    # relative to the root destination, each holding the inputs the page was
+    # rendered from (see depgraph). static: output paths of the static files.
+    # tree, old_tree: snapshots of source now and at the previous build; sources
+    # whose state matches keep the hash and front matter recorded then, unread.
+    # Returns (the table for this build, where every entry also carries the
+    # page's front matter under "meta", the stale (markdown, html) pairs, {html
+    # path: rel_path}, the InputState), for render_planned.
+    if root is None:
+        root = destination
+    if tree is None:
+        tree = scan_tree(source)
+    unchanged = unchanged_entries(entries, source, tree, old_tree or {})
+    pages = collect_pages(source, destination, tree)
+    index = collect_metadata(pages, root, {rel_path: entry["meta"] for rel_path, entry in unchanged.items()})
+    pages = drop_drafts(pages, index, root, drafts)
+    rel_paths = {dest_path: os.path.relpath(dest_path, root).replace(os.sep, "/") for _, dest_path in pages}
+    state = InputState(basepath, rel_paths.values(), static, inline_markdown.image_attributes)
+    for entry in unchanged.values():
+        key = f"source:{entry['source']}"
+        if key in entry["inputs"]:
+            state.assume(key, entry["inputs"][key])
+    new_entries, stale = {}, []
+    for from_path, dest_path in pages:
+        rel_path = rel_paths[dest_path]
+        old = entries.get(rel_path)
+        reasons = explain(old and old.get("inputs"), state)
+        if not reasons and not os.path.exists(dest_path):
+            reasons = ["output missing"]
+        if not reasons and collect_summaries and "info" not in old:
+            reasons = ["no page summary recorded"]
+        metadata = index[rel_path]
+        if not reasons:
+            logging.debug(f"Skipping unchanged page {dest_path}")
+            new_entries[rel_path] = {**old, "meta": metadata}
+            continue
+        (logging.info if explain_rebuilds else logging.debug)(f"Rebuilding {rel_path}: {'; '.join(reasons)}")
+        keys = (f"source:{from_path}", f"template:{resolve_template(template, metadata.get('template'))}",
+                "config:basepath")
+        new_entries[rel_path] = {"source": from_path, "inputs": {key: state.fingerprint(key) for key in keys},
+                                 "meta": metadata}
+        stale.append((from_path, dest_path))
+    return new_entries, stale, rel_paths, state
+
+def render_planned(plans, template, jobs=1, profile=None):
+    # plans: [(basepath, plan_incremental result)] of targets built from the same
+    # sources. A page stale in every target is parsed once and written to all of
+    # them (see generate_page_targets); any other stale page is rendered for its
+    # own target. Returns the new table of every target, without the pages that
+    # failed so the next build retries them, and the [(source path, traceback)]
+    # of the failures.
+    stale_paths = [{rel_paths[dest_path]: (from_path, dest_path) for from_path, dest_path in stale}
+                   for _, (_, stale, rel_paths, _) in plans]
+    shared = set(stale_paths[0]).intersection(*stale_paths[1:])
+    basepaths = [basepath for basepath, _ in plans]
+    # (indexes of the targets served, basepath, pages, outputs in the other targets)
+    groups = [(range(len(plans)), basepaths[0],
+               [pair for rel_path, pair in stale_paths[0].items() if rel_path in shared],
+               {stale_paths[0][rel_path][1]: [(paths[rel_path][1], basepath)
+                                              for paths, basepath in zip(stale_paths[1:], basepaths[1:])]
+                for rel_path in shared})]
+    for i, paths in enumerate(stale_paths):
+        groups.append(([i], basepaths[i], [pair for rel_path, pair in paths.items() if rel_path not in shared], {}))
+    infos, failed, errors = [{} for _ in plans], [set() for _ in plans], []
+    for indexes, basepath, pages, extra_outputs in groups:
+        if not pages:
+            continue
+        rel_paths = {dest_path: rel_path for rel_path, (_, dest_path) in stale_paths[indexes[0]].items()}
+        try:
+            rendered = generate_pages(pages, template, basepath, jobs, profile, extra_outputs)
+        except PageErrors as e:
+            errors += e.errors
+            for i in indexes:
+                failed[i].update(path for path, _ in e.errors)
+            continue
+        for dest_path, info in rendered.items():
+            for i in indexes:
+                infos[i][rel_paths[dest_path]] = info
+    tables = []
+    for (_, (new_entries, _, _, state)), rendered, failed_sources in zip(plans, infos, failed):
+        for rel_path, info in rendered.items():
+            entry = new_entries[rel_path]
+            entry["inputs"].update(link_inputs(info["links"], rel_path, state))
+            if collect_summaries:
+                entry["info"] = {key: value for key, value in info.items() if key != "links"}
+        tables.append({rel_path: entry for rel_path, entry in new_entries.items()
+                       if entry["source"] not in failed_sources})
+    return tables, errors
+
+def gen_page_incremental(source, template, destination, basepath, entries, root=None, jobs=1, profile=None,
+                         static=(), explain_rebuilds=False, drafts=False, tree=None, old_tree=None):
+    # Only pages with a changed input are rendered, see plan_incremental. Returns
+    # the table for this build; on PageErrors it is attached as their entries.
+    plan = plan_incremental(source, template, destination, basepath, entries, root, static, explain_rebuilds,
+                            drafts, tree, old_tree)
+    (new_entries,), errors = render_planned([(basepath, plan)], template, jobs, profile)
+    if errors:
+        error = PageErrors(errors)
+        error.entries = new_entries
+        raise error
+    return new_entries
@@ -1,53 +1,130 @@
+from sys import intern
+from types import MappingProxyType
+import re
+
+URL_PROPS = ("href", "src")
+EMPTY_PROPS = MappingProxyType({}) # shared by every node without attributes
+ROOT_MARKER = "\0" # stands in for the basepath in pre-rendered fragments
+TAG_RE = re.compile(r"<[^>]*>")
+BLOCK_END_RE = re.compile(r"</(?:p|li|h[1-6]|blockquote|pre|ul|ol|div)>")
+URL_RE = re.compile(r' (?:href|src)="([^"]*)"')
+BLOCK_TAGS = frozenset(("p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "ul", "ol", "div"))
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag
+        self.tag = intern(tag) if tag is not None else None
         self.value = value
         self.children = children
-        self.props = props
+        self.props = props or EMPTY_PROPS
         
     def __repr__(self):
         return f'HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})'
         
     def to_html(self):
+        return ''.join(self.iter_html())
+    
+    def iter_html(self, basepath=None):
+        # Yields the serialized HTML in document order, one chunk per tag or leaf.
+        # With a basepath, root-relative href/src values are rewritten to start with it.
         raise NotImplementedError
     
-    def props_to_html(self):
+    def write_to(self, fp, basepath=None):
+        fp.writelines(self.iter_html(basepath))
+    
+    def iter_text(self):
+        # Visible text of the subtree, without markup or image alt text
+        raise NotImplementedError
+    
+    def iter_urls(self):
+        # href/src values in the subtree, root-relative ones still starting with "/"
+        for key in URL_PROPS:
+            value = self.props.get(key)
+            if value:
+                yield value
+        for child in self.children or ():
+            yield from child.iter_urls()
+
+    def props_to_html(self, basepath=None):
         string = ''
-        if self.props == None or self.props == {}:
+        if not self.props:
             return string
         for key,value in self.props.items():
+            if basepath and key in URL_PROPS and value and value.startswith("/"):
+                value = basepath + value[1:]
+            elif basepath and key == "srcset":
+                value = ", ".join(basepath + candidate[1:] if candidate.startswith("/") else candidate
+                                  for candidate in value.split(", "))
             string += f' {key}="{value}"'
         return string
     
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__()
-        self.tag = tag
+        self.tag = intern(tag) if tag is not None else None
         self.value = value
-        self.props = props
+        self.children = None
+        self.props = props or EMPTY_PROPS
         
     
-    def to_html(self):
+    def iter_html(self, basepath=None):
         if self.value is None:
             raise ValueError("All leaf nodes must have a value.")
         elif self.tag is None:
-            return self.value
+            yield self.value
         else:
-            return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            yield f"<{self.tag}{self.props_to_html(basepath)}>{self.value}</{self.tag}>"
+    
+    def iter_text(self):
+        if self.tag != "img" and self.value:
+            yield self.value
         
         
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__()
-        self.tag = tag
+        self.tag = intern(tag) if tag is not None else None
+        self.value = None
         self.children = children
-        self.props = props
+        self.props = props or EMPTY_PROPS
         
-    def to_html(self):
+    def iter_html(self, basepath=None):
         if self.tag is None:
             raise ValueError("An HTML tag is missing")
         elif self.children is None:
             raise ValueError("Parent nodes must have children Leaf nodes")
-        else:
-            return f'''<{self.tag}>{''.join([child.to_html() for child in self.children])}</{self.tag}>'''
+        yield f'<{self.tag}{self.props_to_html(basepath)}>'
+        for child in self.children:
+            yield from child.iter_html(basepath)
+        yield f'</{self.tag}>'
+    
+    def iter_text(self):
+        for child in self.children or ():
+            yield from child.iter_text()
+        if self.tag in BLOCK_TAGS:
+            yield " "
         
+
+class FragmentNode(HTMLNode):
+    # Already serialized HTML, rendered with basepath=ROOT_MARKER so the same
+    # fragment can be emitted for any basepath
+    __slots__ = ()
+
+    def __init__(self, html):
+        self.tag = None
+        self.value = html
+        self.children = None
+        self.props = EMPTY_PROPS
+
+    def iter_html(self, basepath=None):
+        yield self.value.replace(ROOT_MARKER, basepath or "/")
+
+    def iter_text(self):
+        yield TAG_RE.sub("", BLOCK_END_RE.sub(" ", self.value))
+
+    def iter_urls(self):
+        for match in URL_RE.finditer(self.value):
+            yield match.group(1).replace(ROOT_MARKER, "/")
@@ -0,0 +1,165 @@
+import json, logging, os, struct
+from concurrent.futures import ThreadPoolExecutor
+from static_gen import clone_file
+try:
+    from PIL import Image
+except ImportError: # optional: pip install Pillow, only needed for resized variants
+    Image = None
+
+IMAGE_EXTENSIONS = (".png", ".gif", ".jpg", ".jpeg", ".webp")
+IMAGE_CACHE_VERSION = 1
+IMAGE_JOBS = 8
+# JPEG start-of-frame markers; C4, C8 and CC share the range but are not frames
+JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def read_dimensions(location):
+    # (width, height) from the file header without decoding the image, or None
+    with open(location, "rb") as file:
+        head = file.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return webp_dimensions(head)
+        if head[:2] == b"\xff\xd8":
+            file.seek(2)
+            return jpeg_dimensions(file)
+    return None
+
+def webp_dimensions(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+def jpeg_dimensions(file):
+    # Walk the segments up to the first frame header
+    while True:
+        byte = file.read(1)
+        while byte == b"\xff":
+            byte = file.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue # standalone markers carry no length
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        if marker in JPEG_SOF:
+            frame = file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        file.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+def variant_name(rel_path, width):
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}-{width}w{ext}"
+
+def resize_image(from_path, to_path, width):
+    os.makedirs(os.path.dirname(to_path), exist_ok=True)
+    with Image.open(from_path) as image:
+        height = max(1, round(image.height * width / image.width))
+        temp = f"{to_path}.tmp{os.path.splitext(to_path)[1]}"
+        image.resize((width, height), Image.LANCZOS).save(temp)
+    os.replace(temp, to_path)
+
+def load_image_cache(cache_dir):
+    location = os.path.join(cache_dir, "images.json")
+    try:
+        with open(location, "r") as file:
+            cache = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable image cache {location}: {e}")
+        return {}
+    return cache.get("images", {}) if cache.get("version") == IMAGE_CACHE_VERSION else {}
+
+def save_image_cache(cache_dir, images):
+    os.makedirs(cache_dir, exist_ok=True)
+    location = os.path.join(cache_dir, "images.json")
+    temp = location + ".tmp"
+    with open(temp, "w") as file:
+        json.dump({"version": IMAGE_CACHE_VERSION, "images": images}, file, indent=1, sort_keys=True)
+    os.replace(temp, location)
+
+def scan_images(static):
+    images = []
+    for dirpath, _, filenames in os.walk(static):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                location = os.path.join(dirpath, filename)
+                images.append((os.path.relpath(location, static).replace(os.sep, "/"), location))
+    return sorted(images)
+
+def image_props(rel_path, entry):
+    # Extra <img> attributes for the image served at "/" + rel_path
+    props = {"width": str(entry["width"]), "height": str(entry["height"])}
+    if entry["variants"]:
+        candidates = [f"/{variant_name(rel_path, width)} {width}w" for width in sorted(map(int, entry["variants"]))]
+        props["srcset"] = ", ".join(candidates + [f"/{rel_path} {entry['width']}w"])
+        props["sizes"] = f"(max-width: {entry['width']}px) 100vw, {entry['width']}px"
+    return props
+
+def process_images(static, destination, cache_dir=".cache/images", widths=(), jobs=IMAGE_JOBS):
+    # Reads the dimensions of every image under static/ (from the header, and only
+    # when size or mtime changed since the cached entry), renders resized variants
+    # narrower than the original into cache_dir and places them in destination.
+    # Returns ({url: extra img props}, {output rel_path: entry} of the variants).
+    if widths and Image is None:
+        logging.warning("Resized image variants need Pillow (pip install Pillow); only adding dimensions")
+        widths = ()
+    cache = load_image_cache(cache_dir)
+    images, resizes = {}, []
+    for rel_path, location in scan_images(static):
+        stat = os.stat(location)
+        old = cache.get(rel_path, {})
+        if old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns and "width" in old:
+            entry = {**old, "variants": {}}
+        else:
+            dimensions = read_dimensions(location)
+            if dimensions is None:
+                logging.warning(f"Could not read the dimensions of {location}")
+                continue
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "width": dimensions[0],
+                     "height": dimensions[1], "variants": {}}
+            old = {}
+        for width in widths:
+            if width >= entry["width"]:
+                continue
+            variant = os.path.join(cache_dir, "variants", variant_name(rel_path, width))
+            entry["variants"][str(width)] = variant
+            if str(width) not in old.get("variants", {}) or not os.path.exists(variant):
+                resizes.append((location, variant, width))
+        images[rel_path] = entry
+    if resizes:
+        # Pillow releases the GIL while resampling and encoding
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(lambda job: resize_image(*job), resizes))
+        logging.info(f"Rendered {len(resizes)} resized image variant(s)")
+    save_image_cache(cache_dir, images)
+    outputs = {}
+    for rel_path, entry in images.items():
+        for width, variant in entry["variants"].items():
+            out_rel = variant_name(rel_path, int(width))
+            to_path = os.path.join(destination, out_rel)
+            stat = os.stat(variant)
+            outputs[out_rel] = {"source": variant, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            try:
+                current = os.stat(to_path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_size != stat.st_size or current.st_mtime_ns < stat.st_mtime_ns:
+                os.makedirs(os.path.dirname(to_path), exist_ok=True)
+                clone_file(variant, to_path)
+    return {"/" + rel_path: image_props(rel_path, entry) for rel_path, entry in images.items()}, outputs
@@ -1,8 +1,17 @@
 from textnode import TextNode, TextType
-from htmlnode import LeafNode, ParentNode
+from htmlnode import LeafNode, ParentNode, FragmentNode, ROOT_MARKER
 from enum import Enum
+from typing import NamedTuple
 import re
 
+# Compiled once at import; every inline pass below goes through these
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_AT = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)") # anchored with .match(); images are tried first
+# Anything that can start an inline token; text without a match is plain prose
+INLINE_START = re.compile(r"\*\*|[_`\[]|!\[")
+image_attributes = {} # image url -> extra <img> props (width, height, srcset), see images.process_images
+
 def text_to_html(text_node):
     match text_node.text_type:
         case TextType.TEXT:
@@ -14,8 +23,13 @@ def text_to_html(text_node):
         case TextType.CODE:
             return LeafNode("code", text_node.text)
         case TextType.LINK:
+            if text_node.children:
+                return ParentNode("a", [text_to_html(child) for child in text_node.children], {"href": text_node.url})
             return LeafNode("a", text_node.text, {"href": text_node.url})
         case TextType.IMAGE:
+            extra = image_attributes.get(text_node.url)
+            if extra:
+                return LeafNode("img", '', {"src": text_node.url, "alt":text_node.text, **extra})
             return LeafNode("img", '', {"src": text_node.url, "alt":text_node.text})
         case _:
             raise Exception("Not a valid TextType")
@@ -28,45 +42,86 @@ class BlockType(Enum):
     O_LIST = "ordered list"
     UO_LIST = "unordered list"
     
-def block_to_blocktype(block):
-    if block.startswith("```") and block.endswith('```'): # Code block
+class Block(NamedTuple):
+    block_type: BlockType
+    text: str # block markdown, stripped like markdown_to_blocks
+    start: int # first line number (1-based)
+    end: int # last line number
+
+HEADING_PREFIX = re.compile(r"#{1,6} ")
+
+def lines_to_blocktype(lines):
+    # lines of one stripped block; each line is looked at once at most
+    first = lines[0]
+    if first.startswith("```") and lines[-1].endswith('```'): # Code block
         return BlockType.CODE
-    if block.startswith(">"): # Quote
-        for line in block.split("\n"):
+    if first.startswith(">"): # Quote
+        for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH 
         return BlockType.QUOTE
-    if any((block.startswith("# "), #Headings
-            block.startswith("## "),
-            block.startswith("### "),
-            block.startswith("#### "),
-            block.startswith("##### "),
-            block.startswith("###### "))):                     
+    if HEADING_PREFIX.match(first): # Headings
         return BlockType.HEADING
-    if block.startswith("- "): #Unordered list
-        for line in block.split("\n"):
+    if first.startswith("- "): #Unordered list
+        for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH 
         return BlockType.UO_LIST
-    if block.startswith("1. "): #Ordered List
-        for i, line in enumerate(block.split("\n")):
-            if not line.startswith(f"{i+1}. "):
+    if first.startswith("1. "): #Ordered List
+        for i, line in enumerate(lines, 1):
+            if not line.startswith(f"{i}. "):
                 return BlockType.PARAGRAPH 
         return BlockType.O_LIST
     return BlockType.PARAGRAPH 
+
+def block_to_blocktype(block):
+    return lines_to_blocktype(block.split("\n"))
+
+def _make_block(lines, start):
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return Block(lines_to_blocktype(lines), "\n".join(lines), start, start + len(lines) - 1)
+
+def scan_blocks(lines):
+    # One pass over an iterable of lines (a file object works), yielding each
+    # typed Block as soon as it is complete. Blank lines separate blocks, except
+    # inside a ``` fence, which runs until a line ending in ```.
+    current, start, fenced = [], 0, False
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if fenced:
+            current.append(line)
+            if line.rstrip().endswith("```"):
+                yield _make_block(current, start)
+                current, fenced = [], False
+            continue
+        if not line.strip():
+            if current:
+                yield _make_block(current, start)
+                current = []
+            continue
+        if not current:
+            start = number
+            stripped = line.strip()
+            if stripped.startswith("```") and (len(stripped) < 6 or not stripped.endswith("```")):
+                fenced = True
+        current.append(line)
+    if current:
+        if fenced: # unclosed fence runs to the end of the document
+            block = _make_block(current + ["```"], start)
+            yield block._replace(end=block.end - 1)
+        else:
+            yield _make_block(current, start)
        
       
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for node in old_nodes: 
-        if node.text_type != TextType.TEXT:
+        if node.text_type != TextType.TEXT or delimiter not in node.text:
             new_nodes.append(node)
         else:
             split = node.text.split(delimiter)
-            if delimiter not in node.text:
-                new_nodes.append(node) 
-                continue    
-            elif len(split) % 2 == 0:
+            if len(split) % 2 == 0:
                 raise Exception(f"Invalid Markdown syntax for delimiter '{delimiter}'")
             else:
                 new = []
@@ -80,15 +135,19 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return new_nodes
         
 def extract_markdown_images(text):
-    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "![" not in text:
+        return []
+    return IMAGE_RE.findall(text)
     
 def extract_markdown_links(text):
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "[" not in text:
+        return []
+    return LINK_RE.findall(text)
 
 def split_nodes_image(old_nodes):
     new_nodes = []
     for node in old_nodes: 
-        if node.text_type != TextType.TEXT:
+        if node.text_type != TextType.TEXT or "![" not in node.text:
             new_nodes.append(node)
             continue
         node_text = node.text
@@ -109,7 +168,7 @@ def split_nodes_image(old_nodes):
 def split_nodes_link(old_nodes):
     new_nodes = []
     for node in old_nodes: 
-        if node.text_type != TextType.TEXT:
+        if node.text_type != TextType.TEXT or "[" not in node.text:
             new_nodes.append(node)
             continue
         node_text = node.text
@@ -127,27 +186,81 @@ def split_nodes_link(old_nodes):
             new_nodes.append(TextNode(node_text, TextType.TEXT))       
     return new_nodes
 
+DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+
+def split_inline(line):
+    # The multi-pass splitter tokenize_inline replaced: every delimiter over the
+    # whole line first, then images and links in the text that is left
+    nodes = [TextNode(line, TextType.TEXT)]
+    for delimiter, text_type in DELIMITERS.items():
+        nodes = split_nodes_delimiter(nodes, delimiter, text_type)
+    return split_nodes_link(split_nodes_image(nodes))
+
+def label_children(label):
+    # Markup inside a link label, or None to keep the label plain text, as the
+    # multi-pass splitter did when the label's delimiters do not pair up
+    if INLINE_START.search(label) is None:
+        return None
+    try:
+        return tokenize_inline(label)
+    except Exception:
+        return None
+
+def tokenize_inline(line):
+    # Single left-to-right pass over one line. Produces the same nodes as running
+    # split_nodes_delimiter/_image/_link in sequence, but in linear time, and lets
+    # link labels carry their own markup (e.g. bold inside a link).
+    match = INLINE_START.search(line)
+    if match is None:
+        return [TextNode(line, TextType.TEXT)]
+    nodes = []
+    start = 0
+    while match:
+        i = match.start()
+        token = match.group()
+        end = None
+        if token == "![":
+            found = IMAGE_RE.match(line, i)
+            if found:
+                node, end = TextNode(found.group(1), TextType.IMAGE, found.group(2)), found.end()
+        elif token == "[":
+            found = LINK_AT.match(line, i)
+            if found:
+                label = found.group(1)
+                children = label_children(label)
+                node, end = TextNode(label, TextType.LINK, found.group(2), children), found.end()
+        else:
+            close = line.find(token, i + len(token))
+            if close == -1:
+                # The multi-pass splitter may have paired this delimiter with one
+                # inside a link or image, which the lexer keeps whole; such a line
+                # renders as it always did, and fails only if it always failed
+                return split_inline(line)
+            node, end = TextNode(line[i + len(token):close], DELIMITERS[token]), close + len(token)
+        if end is None:
+            match = INLINE_START.search(line, i + 1)
+            continue
+        if i > start:
+            nodes.append(TextNode(line[start:i], TextType.TEXT))
+        nodes.append(node)
+        start = end
+        match = INLINE_START.search(line, end)
+    if start < len(line) or not nodes:
+        nodes.append(TextNode(line[start:], TextType.TEXT))
+    return nodes
+
 def text_to_textnodes(text):
-    lines = text.split("\n")
     nodes = []
-    for line in lines:
-        nodes.append(TextNode(line, TextType.TEXT))
-    nodes = split_nodes_delimiter(nodes, '**', TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, '_', TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    return split_nodes_link(nodes)
+    for line in text.split("\n"):
+        nodes.extend(tokenize_inline(line))
+    return nodes
 
 def markdown_to_blocks(markdown):
-    blocks = []
-    split = markdown.split("\n\n")
-    for item in split:
-        stripped = item.strip()
-        if stripped != "":
-            blocks.append(stripped)
-    return blocks
+    return [block.text for block in scan_blocks(markdown.split("\n"))]
 
 def text_to_children(text):
+    if INLINE_START.search(text) is None: # plain prose: no TextNodes needed
+        return [LeafNode(None, line) for line in text.split("\n")]
     text_nodes = text_to_textnodes(text)
     html_nodes = [text_to_html(node) for node in text_nodes]
     return html_nodes
@@ -176,26 +289,62 @@ def quote_to_html(block):
     return ParentNode("blockquote", text_to_children(' '.join(new_lines))) 
     
     
-def markdown_to_html_node(markdown):
+def block_to_html_node(block, block_type):
+    match block_type:
+        case BlockType.PARAGRAPH:
+            return paragraph_to_html_node(block)
+        case BlockType.UO_LIST: 
+            return ParentNode('ul', ulist_to_html(block))
+        case BlockType.O_LIST:
+            return ParentNode('ol', olist_to_html(block))
+        case BlockType.CODE:
+            code_text = block.splitlines()
+            code_node = TextNode("\n".join(code_text[1:-1]) + "\n", TextType.CODE)
+            return ParentNode('pre', [text_to_html(code_node)])
+        case BlockType.HEADING:
+            header = header_split(block)
+            return ParentNode(f"h{header[0]}", text_to_children(header[1]))
+        case BlockType.QUOTE:
+            return quote_to_html(block)
+    
+def image_fingerprint(block):
+    # Cached fragments bake in the image attributes, so they are part of the key
+    if not image_attributes or "![" not in block:
+        return ""
+    return "".join(f"\0{url}={image_attributes.get(url)}" for _, url in extract_markdown_images(block))
+
+def cached_block_to_html_node(block, block_type, cache):
+    if ROOT_MARKER in block:
+        return block_to_html_node(block, block_type)
+    key = cache.key(block + image_fingerprint(block))
+    html = cache.get(key)
+    if html is None:
+        html = "".join(block_to_html_node(block, block_type).iter_html(ROOT_MARKER))
+        cache.put(key, html)
+    return FragmentNode(html)
+
+def markdown_to_html_node(markdown, cache=None):
+    # With a BlockCache, blocks seen before (on this page or any other) are
+    # emitted from their cached HTML instead of being parsed again
     node = ParentNode("div", [])
-    blocks = markdown_to_blocks(markdown)
-    for block in blocks:
-       block_type = block_to_blocktype(block)
-       match block_type:
-           case BlockType.PARAGRAPH:
-               node.children.append(paragraph_to_html_node(block))
-           case BlockType.UO_LIST: 
-               node.children.append(ParentNode('ul', ulist_to_html(block)))
-           case BlockType.O_LIST: # FIX
-               node.children.append(ParentNode('ol', olist_to_html(block)))
-           case BlockType.CODE:
-               code_text = block.splitlines()
-               code_node = TextNode("\n".join(code_text[1:-1]) + "\n", TextType.CODE)
-               node.children.append(ParentNode('pre', [text_to_html(code_node)]))
-           case BlockType.HEADING:
-               header = header_split(block)
-               node.children.append(ParentNode(f"h{header[0]}", text_to_children(header[1])))
-           case BlockType.QUOTE:
-               node.children.append(quote_to_html(block))
+    for block in scan_blocks(markdown.split("\n")):
+        if cache is not None:
+            node.children.append(cached_block_to_html_node(block.text, block.block_type, cache))
+        else:
+            node.children.append(block_to_html_node(block.text, block.block_type))
     return node          
 
+def iter_markdown_html(lines, basepath=None, cache=None, on_node=None):
+    # Streaming counterpart of markdown_to_html_node(...).iter_html(): each block
+    # is rendered and emitted as soon as it has been scanned, so only one block
+    # is held in memory at a time. on_node, if given, sees every block node.
+    yield "<div>"
+    for block in scan_blocks(lines):
+        if cache is not None:
+            node = cached_block_to_html_node(block.text, block.block_type, cache)
+        else:
+            node = block_to_html_node(block.text, block.block_type)
+        if on_node is not None:
+            on_node(node)
+        yield from node.iter_html(basepath)
+    yield "</div>"
@@ -0,0 +1,36 @@
+import logging, os
+from depgraph import link_target, link_targets
+
+def scan_outputs(destination):
+    # Every file of the built site, relative to destination
+    outputs = set()
+    for dirpath, _, filenames in os.walk(destination):
+        rel_dir = os.path.relpath(dirpath, destination).replace(os.sep, "/")
+        for filename in filenames:
+            outputs.add(filename if rel_dir == "." else f"{rel_dir}/{filename}")
+    return outputs
+
+def page_link_targets(pages, outputs):
+    # pages: {rel_path: urls the page links to}, as collected while rendering
+    return {rel_path: link_targets(links, rel_path, outputs) for rel_path, links in pages.items()}
+
+def manifest_link_targets(entries, outputs):
+    # The same table from the manifest's "pages", for pages an incremental build
+    # skipped. The targets there were resolved against the pages and static files
+    # only, so a link to e.g. a listing page is looked up again among all outputs.
+    return {rel_path: sorted({link_target(key[len("link:"):], outputs) for key in entry["inputs"]
+                              if key.startswith("link:")})
+            for rel_path, entry in entries.items()}
+
+def find_broken_links(targets, outputs):
+    # [(page, target)] for every internal link target that is not an output.
+    # One set lookup per link, no pass over the HTML.
+    return [(rel_path, target) for rel_path in sorted(targets) for target in targets[rel_path]
+            if target not in outputs]
+
+def report_broken_links(broken):
+    for rel_path, target in broken:
+        logging.warning(f"Broken link in {rel_path}: /{target} does not exist")
+    if broken:
+        logging.warning(f"{len(broken)} broken link(s) in {len({rel_path for rel_path, _ in broken})} page(s)")
+    return broken
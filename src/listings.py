@@ -0,0 +1,99 @@
+import json, logging, os, re
+from htmlnode import LeafNode, ParentNode
+from template import load_template
+from output import open_output
+from manifest import hash_bytes, hash_file, prune_outputs
+from site_index import page_url
+
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+PER_PAGE = 10
+
+def slugify(text):
+    return SLUG_RE.sub("-", text.lower()).strip("-")
+
+def listing_path(rel_dir, number):
+    # blog, 1 -> blog/index.html; blog, 2 -> blog/page/2/index.html
+    return f"{rel_dir}/index.html" if number == 1 else f"{rel_dir}/page/{number}/index.html"
+
+def listing_posts(pages, directory):
+    # [(rel_path, metadata)] of the pages below directory, newest first by the
+    # timestamp of their front matter date; pages without a date go last
+    prefix = directory + "/"
+    posts = [(rel_path, metadata) for rel_path, metadata in pages.items()
+             if rel_path.startswith(prefix) and rel_path != prefix + "index.html"]
+    posts.sort(key=lambda post: (post[1].get("timestamp") is not None, post[1].get("timestamp") or 0, post[0]),
+               reverse=True)
+    return posts
+
+def add_pages(plan, rel_dir, title, posts, per_page):
+    count = max(1, -(-len(posts) // per_page))
+    for number in range(1, count + 1):
+        chunk = posts[(number - 1) * per_page:number * per_page]
+        plan[listing_path(rel_dir, number)] = {
+            "title": title if number == 1 else f"{title} (page {number})",
+            "posts": [[page_url(rel_path), metadata.get("title") or rel_path, metadata.get("date") or ""]
+                      for rel_path, metadata in chunk],
+            "newer": page_url(listing_path(rel_dir, number - 1)) if number > 1 else None,
+            "older": page_url(listing_path(rel_dir, number + 1)) if number < count else None,
+        }
+
+def plan_listings(pages, directories, per_page=PER_PAGE):
+    # pages: metadata table {output rel_path: front matter}. Returns
+    # {output rel_path: listing page} for the date-sorted index of each
+    # directory and of each tag used in it, per_page posts at a time.
+    plan = {}
+    for directory in directories:
+        directory = directory.strip("/")
+        posts = listing_posts(pages, directory)
+        name = directory.rsplit("/", 1)[-1].capitalize()
+        add_pages(plan, directory, name, posts, per_page)
+        tags = {}
+        for rel_path, metadata in posts:
+            for tag in metadata.get("tags", ()):
+                tags.setdefault(slugify(tag), (tag, []))[1].append((rel_path, metadata))
+        for slug, (tag, tagged) in sorted(tags.items()):
+            add_pages(plan, f"{directory}/tags/{slug}", f"{name}: {tag}", tagged, per_page)
+    return plan
+
+def listing_to_html_node(listing):
+    items = []
+    for url, title, date in listing["posts"]:
+        children = [LeafNode("a", title, {"href": url})]
+        if date:
+            children.append(LeafNode(None, f" ({date})"))
+        items.append(ParentNode("li", children))
+    children = [LeafNode("h1", listing["title"]), ParentNode("ul", items)]
+    links = []
+    if listing["newer"]:
+        links.append(LeafNode("a", "Newer posts", {"href": listing["newer"]}))
+    if listing["older"]:
+        links.append(LeafNode("a", "Older posts", {"href": listing["older"]}))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children)
+
+def write_listings(destination, pages, directories, template, basepath="/", per_page=PER_PAGE, entries=None):
+    # entries: {rel_path: fingerprint} of the listing pages of the previous build.
+    # Only listing pages whose posts, titles, neighbours, template or basepath
+    # changed are written; listing pages that no longer exist are removed.
+    # Returns the entries for this build.
+    entries = entries or {}
+    plan = plan_listings(pages, directories, per_page)
+    template_hash = hash_file(template)
+    new_entries, written = {}, 0
+    for rel_path, listing in plan.items():
+        if rel_path in pages:
+            raise Exception(f"Listing page {rel_path} would overwrite a content page of the same path")
+        fingerprint = hash_bytes(json.dumps([listing, basepath, template_hash], sort_keys=True).encode())
+        new_entries[rel_path] = fingerprint
+        location = os.path.join(destination, rel_path)
+        if entries.get(rel_path) == fingerprint and os.path.exists(location):
+            continue
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        with open_output(location) as file:
+            load_template(template, basepath).write_to(file, Title=listing["title"],
+                                                       Content=listing_to_html_node(listing).iter_html(basepath))
+        written += 1
+    prune_outputs(destination, entries, new_entries)
+    logging.info(f"Wrote {written} of {len(plan)} listing page(s)")
+    return new_entries
@@ -1,13 +1,163 @@
-from static_gen import copy_dir_static
-from generate_page import gen_page_recursive
-import sys
+from build import BuildConfig, build_full, build_incremental
+from listings import PER_PAGE
+from generate_page import PageErrors, configure_block_cache
+import generate_page
+from serve import serve
+from daemon import serve_daemon
+from client import client_main, SOCKET_PATH
+from profiling import BuildProfile
+import argparse, cProfile, logging, os, sys
+
+def add_verbosity(parser):
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every file that is read, written or skipped")
+
+def setup_logging(args):
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+def add_block_cache(parser):
+    parser.add_argument("--block-cache", type=int, nargs="?", const=4096, default=0, metavar="SIZE",
+                        help="reuse rendered HTML of blocks seen before, keeping SIZE blocks in memory per process")
+    parser.add_argument("--block-cache-dir", metavar="DIR",
+                        help="also keep rendered blocks on disk in DIR (e.g. .cache/blocks) across builds")
+
+def setup_block_cache(args):
+    if args.block_cache or args.block_cache_dir:
+        configure_block_cache(args.block_cache or 4096, args.block_cache_dir)
+
+def parse_target(value):
+    basepath, sep, destination = value.partition(":")
+    if not sep or not basepath or not destination:
+        raise argparse.ArgumentTypeError(f"--target expects BASEPATH:DEST, got '{value}'")
+    return basepath, destination
+
+def add_site_options(parser):
+    # Everything that shapes the built site; shared by build and daemon
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--target", action="append", type=parse_target, default=[], metavar="BASEPATH:DEST",
+                        help="also build the site for BASEPATH into DEST, sharing one parse of every page")
+    parser.add_argument("--no-staging", dest="staging", action="store_false",
+                        help="write straight into docs/ instead of a staging directory swapped in at the end; "
+                             "incremental builds seed the staging directory with one hardlink per file of the "
+                             "live site, which adds up on very large sites")
+    parser.add_argument("--swap", choices=("rename", "symlink"), default="rename",
+                        help="swap in the staged site by renaming it, or by flipping docs/ as a symlink")
+    parser.add_argument("--no-fsync", dest="fsync", action="store_false",
+                        help="skip flushing the staged site to disk (one syncfs call) before swapping it in")
+    parser.add_argument("--drafts", action="store_true", help="also build pages whose front matter says draft: true")
+    parser.add_argument("--listing", action="append", default=[], metavar="DIR",
+                        help="generate paginated, date-sorted index and tag pages for the content directory DIR, e.g. blog")
+    parser.add_argument("--per-page", type=int, default=PER_PAGE, help="posts per listing page")
+    parser.add_argument("--check-links", action="store_true",
+                        help="report internal links and images that point at no output, and exit with status 1 if any")
+    parser.add_argument("--explain", action="store_true", help="with --incremental, log why each page is rebuilt")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes used to render pages (0 = one per CPU)")
+    parser.add_argument("--static-compare", choices=("stat", "hash"), default="stat",
+                        help="how --incremental detects changed static files: size/mtime, or content hash")
+    parser.add_argument("--static-link", action="store_true",
+                        help="hardlink static files into docs/ instead of copying them when possible")
+    parser.add_argument("--stream-threshold", type=int, default=generate_page.stream_threshold, metavar="BYTES",
+                        help="render sources larger than BYTES block by block without loading them whole")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="public URL of the site, e.g. https://example.github.io; writes sitemap.xml and an RSS feed")
+    parser.add_argument("--feed-dir", default="blog", help="content directory whose pages go into the RSS feed")
+    parser.add_argument("--search-index", action="store_true", help="write search-index.json for client-side search")
+    parser.add_argument("--compress", nargs="?", const="gz,br", default="", metavar="FORMATS",
+                        help="write precompressed .gz/.br siblings of text outputs (brotli needs the brotli package)")
+    parser.add_argument("--image-sizes", action="store_true",
+                        help="add width and height read from static/ images to every <img>")
+    parser.add_argument("--image-widths", default="", metavar="WIDTHS",
+                        help="comma-separated widths, e.g. 480,960, of resized variants offered via srcset (needs Pillow)")
+    add_block_cache(parser)
+    add_verbosity(parser)
+
+def site_config(args, profile=None):
+    setup_logging(args)
+    setup_block_cache(args)
+    generate_page.stream_threshold = args.stream_threshold
+    return BuildConfig(basepath=args.basepath, jobs=args.jobs or os.cpu_count() or 1,
+                       static_compare=args.static_compare, static_link=args.static_link, profile=profile,
+                       site_url=args.site_url, search_index=args.search_index, feed_dir=args.feed_dir,
+                       compress=tuple(fmt for fmt in args.compress.split(",") if fmt),
+                       images=args.image_sizes,
+                       image_widths=tuple(int(width) for width in args.image_widths.split(",") if width),
+                       explain=args.explain, staging=args.staging, swap=args.swap, fsync=args.fsync,
+                       check_links=args.check_links, drafts=args.drafts, listings=tuple(args.listing),
+                       per_page=args.per_page, targets=args.target)
+
+def build_main(argv):
+    parser = argparse.ArgumentParser(description="Build the site from content/ and static/ into docs/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild outputs whose source, template or basepath changed since the last build")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every build phase and page and print a summary")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N", help="slowest pages listed by --profile")
+    parser.add_argument("--profile-trace", metavar="FILE", help="also write a Chrome trace (chrome://tracing) to FILE")
+    parser.add_argument("--cprofile", metavar="FILE", help="write cProfile stats of the main process to FILE")
+    add_site_options(parser)
+    args = parser.parse_args(argv)
+    profile = BuildProfile() if args.profile or args.profile_trace else None
+    config = site_config(args, profile)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler:
+        profiler.enable()
+    try:
+        if args.incremental:
+            broken = build_incremental(config)
+        else:
+            broken = build_full(config)
+    except PageErrors as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if profile:
+            print(profile.summary(args.profile_top))
+            if args.profile_trace:
+                profile.write_chrome_trace(args.profile_trace)
+    if broken:
+        sys.exit(1)
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Build the site and serve docs/ over HTTP")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--watch", action="store_true",
+                        help="poll content/, static/ and the templates and rebuild changed outputs")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between polls in watch mode")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes used for the initial build (0 = one per CPU)")
+    parser.add_argument("--drafts", action="store_true", help="also build pages whose front matter says draft: true")
+    add_block_cache(parser)
+    add_verbosity(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args)
+    setup_block_cache(args)
+    config = BuildConfig(basepath=args.basepath, jobs=args.jobs or os.cpu_count() or 1, drafts=args.drafts)
+    serve(config, args.port, args.watch, args.interval)
+
+def daemon_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py daemon",
+                                     description="Keep a build process with warm caches running, driven by main.py client")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket to listen on")
+    add_site_options(parser)
+    args = parser.parse_args(argv)
+    config = site_config(args)
+    if not (args.block_cache or args.block_cache_dir):
+        configure_block_cache()
+    serve_daemon(config, args.socket)
 
 def main():
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-    else: basepath = "/"
-    copy_dir_static("static", "docs")
-    gen_page_recursive("content", "template.html", "docs", basepath)
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        daemon_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "client":
+        client_main(sys.argv[2:])
+    else:
+        build_main(sys.argv[1:])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
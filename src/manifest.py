@@ -0,0 +1,85 @@
+import hashlib, json, os, logging
+
+MANIFEST_DIR = ".cache/manifests" # outside the published site: it holds local mtimes and inodes
+MANIFEST_VERSION = 4 # 2: pages record their inputs (see depgraph); 3: and their front matter, plus the source tree;
+                     # 4: front matter dates are parsed into a timestamp
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_file(location):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(location, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+_hashes = {} # path -> (stat key, digest), kept for the life of the process
+
+def hash_file_cached(location):
+    # hash_file, skipped while the file's mtime, size and inode are unchanged;
+    # a long-running process (see daemon) then only rehashes what was edited
+    stat = os.stat(location)
+    key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cached = _hashes.get(location)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hash_file(location)
+    _hashes[location] = (key, digest)
+    return digest
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "pages": {}, "static": {}, "compressed": {}, "listings": {},
+            "tree": {"static": {}, "content": {}}}
+
+def manifest_path(destination, directory=MANIFEST_DIR):
+    # One manifest per destination, e.g. .cache/manifests/docs-<hash of its absolute path>.json
+    destination = os.path.abspath(destination).rstrip(os.sep)
+    name = os.path.basename(destination)
+    return os.path.join(directory, f"{name}-{hash_bytes(destination.encode())[:16]}.json")
+
+def load_manifest(location):
+    try:
+        with open(location, "r") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return new_manifest()
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest {location}: {e}")
+        return new_manifest()
+    if manifest.get("version") != MANIFEST_VERSION:
+        logging.info(f"Manifest {location} is from another version, rebuilding everything")
+        return new_manifest()
+    for key, value in new_manifest().items():
+        manifest.setdefault(key, value)
+    return manifest
+
+def save_manifest(location, manifest):
+    os.makedirs(os.path.dirname(location) or ".", exist_ok=True)
+    temp = location + ".tmp"
+    with open(temp, "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp, location)
+
+def prune_outputs(destination, old_entries, new_entries):
+    # Remove outputs whose source disappeared, then any directories left empty
+    removed = []
+    for rel_path in sorted(set(old_entries) - set(new_entries)):
+        location = os.path.join(destination, rel_path)
+        try:
+            os.remove(location)
+        except FileNotFoundError:
+            continue
+        removed.append(rel_path)
+        logging.debug(f"Removed stale output {location}")
+        remove_empty_parents(destination, location)
+    return removed
+
+def remove_empty_parents(destination, location):
+    parent = os.path.dirname(location)
+    while os.path.abspath(parent) != os.path.abspath(destination):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
@@ -0,0 +1,122 @@
+import ctypes, ctypes.util, logging, os, shutil, time
+from concurrent.futures import ThreadPoolExecutor
+from static_gen import clone_file
+
+WRITE_BUFFER = 1 << 17 # outputs reach the filesystem in few large writes; bounded for streamed pages
+SYNC_JOBS = 16
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2 # Linux renameat2 flag: atomically swap two existing paths
+
+def open_output(location, mode="w"):
+    # Unlink first: the output may be a hardlink shared with the live site
+    # (incremental staging is seeded with links) or with static/
+    try:
+        os.unlink(location)
+    except FileNotFoundError:
+        pass
+    return open(location, mode, buffering=WRITE_BUFFER)
+
+def staging_path(destination):
+    return os.path.abspath(destination).rstrip(os.sep) + ".staging"
+
+def link_tree(source, destination):
+    # Mirror source into destination with hardlinks (copies across filesystems),
+    # so an incremental build only has to rewrite what changed
+    count = 0
+    for dirpath, _, filenames in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(dirpath, source))
+        os.makedirs(target, exist_ok=True)
+        for filename in filenames:
+            clone_file(os.path.join(dirpath, filename), os.path.join(target, filename), link=True)
+            count += 1
+    return count
+
+def fsync_path(location):
+    fd = os.open(location, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def sync_tree(directory, jobs=SYNC_JOBS):
+    # fsync every file, then every directory, a batch at a time on a thread
+    # pool (fsync releases the GIL) instead of once per write
+    files, directories = [], []
+    for dirpath, _, filenames in os.walk(directory):
+        directories.append(dirpath)
+        files.extend(os.path.join(dirpath, filename) for filename in filenames)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(fsync_path, files))
+        list(executor.map(fsync_path, directories))
+
+def load_libc():
+    libc_name = ctypes.util.find_library("c")
+    return ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+
+def sync_filesystem(directory):
+    # Flush everything written below directory in one call instead of an fsync
+    # per file: syncfs() on the filesystem holding it where available (Linux),
+    # else sync(), else sync_tree
+    libc = load_libc()
+    if libc is not None and hasattr(libc, "syncfs"):
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            if libc.syncfs(fd) == 0:
+                return "syncfs"
+            logging.debug(f"syncfs failed: {os.strerror(ctypes.get_errno())}")
+        finally:
+            os.close(fd)
+    if hasattr(os, "sync"):
+        os.sync()
+        return "sync"
+    sync_tree(directory)
+    return "fsync"
+
+def exchange_paths(first, second):
+    # True if the two paths were swapped in one atomic step
+    libc = load_libc()
+    if libc is None or not hasattr(libc, "renameat2"):
+        return False
+    result = libc.renameat2(AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE)
+    if result != 0:
+        logging.debug(f"renameat2 failed: {os.strerror(ctypes.get_errno())}")
+        return False
+    return True
+
+def swap_directory(staging, destination, mode="rename"):
+    # Put the finished staging directory in place of destination. With
+    # mode="rename" the two directories are exchanged atomically where the
+    # kernel allows it, otherwise destination is missing for the instant
+    # between two renames. With mode="symlink", destination is a symlink that
+    # is flipped to a new versioned directory.
+    destination = os.path.abspath(destination).rstrip(os.sep)
+    if mode == "symlink":
+        version = f"{destination}.{time.time_ns()}"
+        os.rename(staging, version)
+        previous = os.path.realpath(destination) if os.path.islink(destination) else None
+        if os.path.isdir(destination) and previous is None:
+            shutil.rmtree(destination) # first switch from a real directory
+        link = f"{destination}.link"
+        if os.path.lexists(link):
+            os.unlink(link)
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, destination)
+        if previous and previous != version:
+            shutil.rmtree(previous, ignore_errors=True)
+        return
+    if os.path.islink(destination):
+        # Switching back from symlink mode
+        previous = os.path.realpath(destination)
+        os.unlink(destination)
+        os.rename(staging, destination)
+        shutil.rmtree(previous, ignore_errors=True)
+    elif not os.path.exists(destination):
+        os.rename(staging, destination)
+    elif exchange_paths(staging, destination):
+        shutil.rmtree(staging) # now holds the previous site
+    else:
+        old = destination + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(destination, old)
+        os.rename(staging, destination)
+        shutil.rmtree(old)
@@ -0,0 +1,65 @@
+import json, os, threading, time
+from contextlib import contextmanager
+
+class PageTimer:
+    # Collects (phase, start, end) spans for one page; cheap enough to ship back
+    # from a worker process as a plain list
+    def __init__(self):
+        self.spans = []
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.spans.append((phase, self.last, now))
+        self.last = now
+
+class BuildProfile:
+    def __init__(self):
+        self.pages = {} # page -> {phase: seconds}
+        self.phases = {} # phase -> total seconds
+        self.events = [] # Chrome trace events
+        self.origin = time.perf_counter()
+
+    def _event(self, name, category, start, end, pid=None, tid=None):
+        self.events.append({"name": name, "cat": category, "ph": "X",
+                            "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6,
+                            "pid": pid or os.getpid(), "tid": tid or threading.get_ident()})
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.add(name, end - start)
+            self._event(name, "build", start, end)
+
+    def add_page(self, page, spans, pid=None):
+        # perf_counter is system-wide on the platforms we build on, so spans from
+        # worker processes line up with the main process on the trace timeline
+        timings = self.pages.setdefault(page, {})
+        for phase, start, end in spans:
+            timings[phase] = timings.get(phase, 0.0) + end - start
+            self.add(phase, end - start)
+            self._event(f"{phase}: {page}", "page", start, end, pid, pid)
+
+    def summary(self, top=10):
+        lines = ["Phase totals:"]
+        width = max([len(phase) for phase in self.phases] + [5])
+        for phase, seconds in sorted(self.phases.items(), key=lambda item: -item[1]):
+            lines.append(f"  {phase:<{width}} {seconds * 1000:10.1f} ms")
+        slowest = sorted(self.pages.items(), key=lambda item: -sum(item[1].values()))[:top]
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} of {len(self.pages)} pages:")
+            for page, timings in slowest:
+                worst = max(timings, key=timings.get)
+                lines.append(f"  {sum(timings.values()) * 1000:10.1f} ms  {page}  (mostly {worst})")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, location):
+        with open(location, "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
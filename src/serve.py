@@ -0,0 +1,117 @@
+from build import build_incremental, scan_sources
+from generate_page import generate_page, read_page_metadata, PageErrors
+from static_gen import clone_file
+from tree import scan_tree, file_state, diff_snapshots
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import functools, logging, os, threading, time
+
+def snapshot(paths):
+    # path -> (size, mtime, inode) for every file under the given files/directories
+    files = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files.update((os.path.join(path, rel_path), state) for rel_path, state in scan_tree(path).items())
+        elif os.path.isfile(path):
+            files[path] = file_state(os.stat(path))
+    return files
+
+class Watcher:
+    def __init__(self, config, tree=None):
+        # tree: the snapshots a build just took (see scan_sources), reused
+        # instead of walking static/ and content/ again
+        self.static, self.content, self.template = config.static, config.content, config.template
+        self.destination, self.basepath = config.destination, config.basepath
+        self.drafts = config.drafts
+        self.templates = [self.template, os.path.join(os.path.dirname(self.template) or ".", "templates")]
+        if tree is None:
+            self.state = snapshot([self.static, self.content] + self.templates)
+        else:
+            self.state = snapshot(self.templates)
+            for root, name in ((self.static, "static"), (self.content, "content")):
+                self.state.update((os.path.join(root, rel_path), state) for rel_path, state in tree[name].items())
+
+    def output_for(self, path):
+        if path.startswith(self.content + os.sep) and path.endswith(".md"):
+            return os.path.join(self.destination, os.path.relpath(path, self.content)[:-3] + ".html")
+        if path.startswith(self.static + os.sep):
+            return os.path.join(self.destination, os.path.relpath(path, self.static))
+        return None
+
+    def is_template(self, path):
+        return path == self.template or path.startswith(self.templates[1] + os.sep)
+
+    def poll(self):
+        # Rebuild only the outputs whose inputs changed since the last poll;
+        # returns the number of outputs written or removed
+        new_state = snapshot([self.static, self.content] + self.templates)
+        changed, removed = diff_snapshots(self.state, new_state)
+        self.state = new_state
+        return self.rebuild(changed, removed)
+
+    def rebuild(self, changed, removed):
+        # Write or remove the outputs of the given source paths
+        if not changed and not removed:
+            return 0
+        if any(self.is_template(path) for path in changed | removed):
+            # The compiled template cache notices the new mtime on its own
+            changed |= {path for path in self.state if path.endswith(".md") and path.startswith(self.content + os.sep)}
+        count = 0
+        for path in sorted(removed):
+            output = self.output_for(path)
+            if output and os.path.exists(output):
+                os.remove(output)
+                logging.debug(f"Removed {output}")
+                count += 1
+        for path in sorted(changed):
+            output = self.output_for(path)
+            if output is None:
+                continue
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            if path.endswith(".md") and path.startswith(self.content + os.sep):
+                try:
+                    if not self.drafts and read_page_metadata(path)["draft"]:
+                        if os.path.exists(output):
+                            os.remove(output)
+                            count += 1
+                        continue
+                    generate_page(path, self.template, output, self.basepath)
+                except Exception as e:
+                    logging.error(f"Failed to generate {path}: {e}")
+                    continue
+            else:
+                clone_file(path, output)
+            count += 1
+        return count
+
+    def watch(self, interval=0.1):
+        while True:
+            start = time.perf_counter()
+            count = self.poll()
+            if count:
+                logging.info(f"Rebuilt {count} output(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            time.sleep(interval)
+
+def start_server(directory, port):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Serving {directory} at http://localhost:{server.server_address[1]}/")
+    return server
+
+def serve(config, port=8888, watch=False, interval=0.1):
+    tree = scan_sources(config)
+    try:
+        build_incremental(config, tree)
+    except PageErrors as e:
+        logging.error(str(e))
+    server = start_server(config.destination, port)
+    try:
+        if watch:
+            Watcher(config, tree).watch(interval)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
@@ -0,0 +1,117 @@
+import datetime, json, os, re
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+from output import open_output
+
+WORD_RE = re.compile(r"\w{2,}")
+LINK_ONLY_RE = re.compile(r"<p><a [^>]*>(?:(?!</a>).)*</a></p>") # e.g. a "< Back Home" line
+EXCERPT_LENGTH = 200
+
+def is_heading(node):
+    if node.tag is None:
+        return node.value.startswith("<h") and node.value[2:3].isdigit()
+    return len(node.tag) == 2 and node.tag[0] == "h" and node.tag[1].isdigit()
+
+def is_link_only(node):
+    return LINK_ONLY_RE.fullmatch("".join(node.iter_html())) is not None
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(" ", 1)[0] + "…"
+
+class PageSummary:
+    # Built up one block-level node at a time while a page renders, so streamed
+    # pages can be summarized without keeping their body around
+    def __init__(self):
+        self.excerpt = None
+        self.tokens = set()
+
+    def add(self, node):
+        text = "".join(node.iter_text())
+        self.tokens.update(WORD_RE.findall(text.lower()))
+        if self.excerpt is None and text.strip() and not is_heading(node) and not is_link_only(node):
+            self.excerpt = make_excerpt(text)
+
+    def to_dict(self, title, metadata):
+        return {"title": title, "date": metadata.get("date"), "timestamp": metadata.get("timestamp"),
+                "excerpt": self.excerpt or "", "tokens": sorted(self.tokens)}
+
+def page_url(rel_path, basepath="/"):
+    # blog/tom/index.html -> {basepath}blog/tom/
+    if rel_path == "index.html":
+        rel_path = ""
+    elif rel_path.endswith("/index.html"):
+        rel_path = rel_path[:-len("index.html")]
+    return basepath + rel_path
+
+def page_date(info):
+    # Front matter date if there is one (see front_matter.parse_date), else when
+    # the source last changed
+    if info.get("timestamp") is not None:
+        return datetime.datetime.fromtimestamp(info["timestamp"], datetime.timezone.utc)
+    mtime = os.path.getmtime(info["source"]) if os.path.exists(info.get("source", "")) else 0
+    return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+
+def write_sitemap(destination, pages, site_url, basepath="/"):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for rel_path in sorted(pages):
+        lines.append(f"<url><loc>{escape(site_url + page_url(rel_path, basepath))}</loc>"
+                     f"<lastmod>{page_date(pages[rel_path]).date().isoformat()}</lastmod></url>")
+    lines.append("</urlset>")
+    with open_output(os.path.join(destination, "sitemap.xml")) as file:
+        file.write("\n".join(lines) + "\n")
+
+def write_feed(destination, pages, site_url, basepath="/", feed_dir="blog", title=None):
+    prefix = feed_dir.strip("/") + "/"
+    posts = [(page_date(info), rel_path, info) for rel_path, info in pages.items()
+             if rel_path.startswith(prefix) and rel_path != prefix + "index.html"]
+    if not posts:
+        return None
+    posts.sort(key=lambda post: (post[0], post[1]), reverse=True)
+    channel_title = title or (pages.get("index.html") or {}).get("title") or feed_dir
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<rss version="2.0"><channel>',
+             f"<title>{escape(channel_title)}</title>",
+             f"<link>{escape(site_url + page_url(prefix, basepath))}</link>",
+             f"<description>{escape(channel_title)}</description>"]
+    for date, rel_path, info in posts:
+        url = escape(site_url + page_url(rel_path, basepath))
+        lines.append(f"<item><title>{escape(info.get('title') or '')}</title><link>{url}</link><guid>{url}</guid>"
+                     f"<pubDate>{format_datetime(date)}</pubDate>"
+                     f"<description>{escape(info.get('excerpt') or '')}</description></item>")
+    lines.append("</channel></rss>")
+    location = os.path.join(destination, feed_dir.strip("/"), "rss.xml")
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    with open_output(location) as file:
+        file.write("\n".join(lines) + "\n")
+    return location
+
+def build_search_index(pages, basepath="/"):
+    # Inverted index: token -> ascending doc ids, delta-encoded so the JSON stays
+    # small ([3, 1, 4] means docs 3, 4 and 8)
+    docs, postings = [], {}
+    for doc_id, rel_path in enumerate(sorted(pages)):
+        info = pages[rel_path]
+        docs.append([page_url(rel_path, basepath), info.get("title") or "", info.get("excerpt") or ""])
+        for token in info.get("tokens", ()):
+            postings.setdefault(token, []).append(doc_id)
+    index = {}
+    for token in sorted(postings):
+        ids = postings[token]
+        index[token] = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+    return {"docs": docs, "index": index}
+
+def write_search_index(destination, pages, basepath="/"):
+    with open_output(os.path.join(destination, "search-index.json")) as file:
+        json.dump(build_search_index(pages, basepath), file, separators=(",", ":"), ensure_ascii=False)
+
+def write_site_indexes(destination, pages, basepath="/", site_url=None, search_index=False, feed_dir="blog"):
+    # pages: output path relative to destination -> PageSummary.to_dict() plus "source"
+    if site_url:
+        site_url = site_url.rstrip("/")
+        write_sitemap(destination, pages, site_url, basepath)
+        write_feed(destination, pages, site_url, basepath, feed_dir)
+    if search_index:
+        write_search_index(destination, pages, basepath)
@@ -1,7 +1,13 @@
-import os, sys, shutil, logging
-logging.basicConfig(level=logging.INFO)
+import os, sys, shutil, logging, errno
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_file
+from tree import scan_tree, output_dirs
+try:
+    import fcntl
+except ImportError: # not available on Windows
+    fcntl = None
 
-def copy_dir_static(src, dest):
+def copy_dir_static(src, dest, tree=None):
     source, destination = os.path.abspath(src), os.path.abspath(dest)
     if not os.path.exists(destination):
         os.mkdir(destination)
@@ -12,23 +18,99 @@ def copy_dir_static(src, dest):
         os.mkdir(destination)
     if not (os.path.isdir(source) and os.path.isdir(destination)):
         raise Exception("Either arguement is not a directory")
-    copy_dir_recursive(source, destination)
+    copy_dir_recursive(source, destination, tree)
 
-def copy_dir_recursive(source, destination):
-    files = os.listdir(source)
-    logging.info(f"Copying files in {source}")
-    for file in files:
-        logging.info(f"File name: {file}, isDir: {os.path.isdir(os.path.join(source, file))}")
-        if os.path.isdir(os.path.join(source, file)):
-            if file not in os.listdir(destination):
-                os.mkdir(os.path.join(destination, file))
-            copy_dir_recursive(os.path.join(source, file), os.path.join(destination, file))
+def copy_dir_recursive(source, destination, tree=None):
+    # tree: snapshot of source (see tree.scan_tree), taken here if not given
+    if tree is None:
+        tree = scan_tree(source)
+    logging.debug(f"Copying {len(tree)} files from {source}")
+    output_dirs(destination, tree)
+    for rel_path in tree:
+        shutil.copy(os.path.join(source, rel_path), os.path.join(destination, rel_path))
+
+FICLONE = 0x40049409 # Linux ioctl: share the source's extents (btrfs, XFS, ...)
+COPY_JOBS = 8
+
+def clone_file(from_path, to_path, link=False):
+    # Cheapest available way to give to_path the content of from_path: a hardlink
+    # if allowed, otherwise a reflink, copy_file_range, or finally a plain copy.
+    # The old output is always unlinked first, so a hardlinked output from an
+    # earlier build never gets truncated in place (that would clobber static/).
+    try:
+        os.unlink(to_path)
+    except FileNotFoundError:
+        pass
+    if link:
+        try:
+            os.link(from_path, to_path)
+            return "link"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+    with open(from_path, "rb") as src, open(to_path, "wb") as dst:
+        method = "copy"
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                method = "reflink"
+            except OSError:
+                pass
+        if method == "copy" and hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                method = "copy_file_range"
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        if method == "copy":
+            shutil.copyfileobj(src, dst, 1 << 20)
+    shutil.copymode(from_path, to_path)
+    return method
+
+def sync_dir_static(src, dest, entries, compare="stat", link=False, jobs=COPY_JOBS, tree=None):
+    # Copy only the files that changed since the previous build's manifest entries
+    # and return the entries for this build, keyed by path relative to dest.
+    # compare="stat" trusts size and mtime; compare="hash" checks the content.
+    # tree: snapshot of src (see tree.scan_tree), taken here if not given.
+    source, destination = os.path.abspath(src), os.path.abspath(dest)
+    if not os.path.isdir(source):
+        raise Exception("Either arguement is not a directory")
+    if tree is None:
+        tree = scan_tree(source)
+    os.makedirs(destination, exist_ok=True)
+    output_dirs(destination, tree)
+    new_entries, changed = {}, []
+    for rel_path, (size, mtime_ns, _) in tree.items():
+        from_path, to_path = os.path.join(source, rel_path), os.path.join(destination, rel_path)
+        entry = {"source": os.path.relpath(from_path), "size": size, "mtime_ns": mtime_ns}
+        old = entries.get(rel_path, {})
+        if compare == "hash":
+            # Only rehash when the cheap stat check says something moved
+            if all(old.get(key) == entry[key] for key in entry) and "hash" in old:
+                entry["hash"] = old["hash"]
+            else:
+                entry["hash"] = hash_file(from_path)
+            unchanged = old.get("hash") == entry["hash"]
         else:
-            shutil.copy(os.path.join(source, file), destination)
-            logging.info(f"Copying {file} to {destination}")
-    return
+            unchanged = all(old.get(key) == entry[key] for key in entry)
+        if not unchanged or not os.path.exists(to_path):
+            changed.append((from_path, to_path))
+        new_entries[rel_path] = entry
+    if changed:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for (from_path, to_path), method in zip(changed, executor.map(lambda pair: clone_file(*pair, link), changed)):
+                logging.debug(f"Copied {from_path} to {to_path} ({method})")
+    return new_entries
            
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     if len(sys.argv) != 3:
         print("Requires 2 positional arguements: source dir, destination dir")
         sys.exit()
@@ -0,0 +1,63 @@
+import os, re
+
+SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+ROOT_URL = re.compile(r'\b(href|src)="/')
+
+class Template:
+    def __init__(self, text, basepath="/"):
+        # Compiled once: alternating literal strings and slot names. Literals already
+        # carry the basepath, so rendering is a single pass over the segments.
+        self.segments = [] # (is_slot, literal text or slot name)
+        position = 0
+        for match in SLOT.finditer(text):
+            self._add_literal(text[position:match.start()], basepath)
+            self.segments.append((True, match.group(1)))
+            position = match.end()
+        self._add_literal(text[position:], basepath)
+        self.slots = {name for is_slot, name in self.segments if is_slot}
+
+    def _add_literal(self, text, basepath):
+        if text:
+            self.segments.append((False, ROOT_URL.sub(lambda m: f'{m.group(1)}="{basepath}', text)))
+
+    def iter_render(self, **values):
+        # Slot values may be strings or iterables of string chunks (e.g. HTMLNode.iter_html)
+        for is_slot, segment in self.segments:
+            if not is_slot:
+                yield segment
+                continue
+            value = values.get(segment, "")
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+
+    def render(self, **values):
+        return "".join(self.iter_render(**values))
+
+    def write_to(self, fp, **values):
+        fp.writelines(self.iter_render(**values))
+
+_templates = {}
+
+def load_template(location, basepath="/"):
+    # Compiled templates are cached per process for the whole build and only
+    # re-read when the file changes on disk
+    stat = os.stat(location)
+    key = (os.path.abspath(location), basepath)
+    cached = _templates.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    with open(location, "r") as file:
+        template = Template(file.read(), basepath)
+    _templates[key] = ((stat.st_mtime_ns, stat.st_size), template)
+    return template
+
+def resolve_template(default_location, name=None):
+    # Named templates (front matter "template: post") live in templates/ next to
+    # the default template
+    if not name:
+        return default_location
+    if os.path.basename(name) != name or name.startswith("."):
+        raise Exception(f"Invalid template name '{name}'")
+    return os.path.join(os.path.dirname(default_location), "templates", f"{name}.html")
@@ -0,0 +1,55 @@
+import tempfile, unittest
+from block_cache import BlockCache
+from inline_markdown import markdown_to_html_node
+
+PAGE = """# Title
+
+A paragraph with a [link](/blog/tom) and ![an image](/images/tom.png).
+
+- one
+- two
+
+```
+code with [not a link](/x)
+```
+
+> quoted **bold**
+"""
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = BlockCache(maxsize=2)
+        for block in ("a", "b", "c"):
+            cache.put(cache.key(block), block.upper())
+        self.assertIsNone(cache.get(cache.key("a")))
+        self.assertEqual(cache.get(cache.key("b")), "B")
+        cache.put(cache.key("d"), "D")
+        self.assertEqual(cache.get(cache.key("b")), "B")
+        self.assertIsNone(cache.get(cache.key("c")))
+
+    def test_disk_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            BlockCache(directory=directory).put(BlockCache().key("block"), "<p>block</p>")
+            cache = BlockCache(directory=directory)
+            self.assertEqual(cache.get(cache.key("block")), "<p>block</p>")
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_cached_render_matches(self):
+        cache = BlockCache()
+        for basepath in (None, "/", "/site-generator/"):
+            expected = markdown_to_html_node(PAGE).to_html() if basepath is None else \
+                "".join(markdown_to_html_node(PAGE).iter_html(basepath))
+            for _ in range(2):
+                self.assertEqual("".join(markdown_to_html_node(PAGE, cache).iter_html(basepath)), expected)
+
+    def test_edit_renders_one_block(self):
+        cache = BlockCache()
+        markdown_to_html_node(PAGE, cache)
+        misses = cache.misses
+        markdown_to_html_node(PAGE.replace("one", "uno"), cache)
+        self.assertEqual(cache.misses - misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
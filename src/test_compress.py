@@ -0,0 +1,52 @@
+import gzip, os, unittest
+from unittest import mock
+from compress import compress_outputs, remove_siblings
+from fixtures import TempDirTestCase
+
+
+class TestCompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = self.root
+        self.write("index.html", "<p>hello world</p>\n" * 200)
+        self.write("blog/post.html", "<p>post</p>\n" * 200)
+        self.write("tiny.txt", "x")
+        self.write("image.png", "not text" * 200)
+
+    def test_writes_gzip_siblings(self):
+        entries = compress_outputs(self.dest, {}, ("gz",))
+        self.assertEqual(sorted(entries), ["blog/post.html", "index.html", "tiny.txt"])
+        with gzip.open(self.path("index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), "<p>hello world</p>\n" * 200)
+        # Not worth it for a single byte, and binary assets are left alone
+        self.assertFalse(os.path.exists(self.path("tiny.txt.gz")))
+        self.assertFalse(os.path.exists(self.path("image.png.gz")))
+
+    def test_skips_unchanged_content(self):
+        entries = compress_outputs(self.dest, {}, ("gz",))
+        os.utime(self.path("index.html.gz"), ns=(0, 0))
+        self.write("blog/post.html", "<p>edited</p>\n" * 200)
+        entries = compress_outputs(self.dest, entries, ("gz",))
+        self.assertEqual(os.stat(self.path("index.html.gz")).st_mtime_ns, 0)
+        with gzip.open(self.path("blog/post.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), "<p>edited</p>\n" * 200)
+
+    def test_removes_stale_siblings(self):
+        entries = compress_outputs(self.dest, {}, ("gz",))
+        os.remove(self.path("index.html"))
+        entries = compress_outputs(self.dest, entries, ("gz",))
+        self.assertNotIn("index.html", entries)
+        self.assertFalse(os.path.exists(self.path("index.html.gz")))
+        remove_siblings(self.dest, entries)
+        self.assertFalse(os.path.exists(self.path("blog/post.html.gz")))
+
+    def test_missing_brotli_is_reported(self):
+        entries = compress_outputs(self.dest, {}, ("gz",))
+        with mock.patch("compress.brotli", None), self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(compress_outputs(self.dest, entries, ("br",)), {})
+        self.assertIn("need the brotli package", logs.output[0])
+        self.assertFalse(os.path.exists(self.path("index.html.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import gzip, os, threading, unittest
+import generate_page
+from client import send_request
+from daemon import serve_daemon, daemon_running
+from fixtures import TempDirTestCase
+
+
+class TestBuildDaemon(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config()
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        self.write("content/index.md", "# Home\n\nWelcome home.")
+        self.write("content/blog/index.md", "# Blog\n\nPosts.")
+        self.socket = self.path("build.sock")
+        self.thread = threading.Thread(target=serve_daemon, args=(self.config, self.socket))
+        self.thread.start()
+        for _ in range(500):
+            if os.path.exists(self.socket):
+                break
+            self.thread.join(0.01)
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            send_request({"command": "shutdown"}, self.socket)
+        self.thread.join()
+        super().tearDown()
+
+    def test_build_rebuild_and_shutdown(self):
+        response = send_request({"command": "rebuild", "paths": []}, self.socket)
+        self.assertFalse(response["ok"])
+        self.assertIn("Nothing built yet", response["error"])
+        response = send_request({"command": "build"}, self.socket)
+        self.assertTrue(response["ok"])
+        self.assertIn("Posts.", self.read("docs/blog/index.html"))
+        self.edit("content/blog/index.md", "# Blog\n\nMore posts.")
+        response = send_request({"command": "rebuild", "paths": [self.path("content", "blog", "index.md")]},
+                                self.socket)
+        self.assertTrue(response["ok"])
+        self.assertIn("More posts.", self.read("docs/blog/index.html"))
+        status = send_request({"command": "status"}, self.socket)
+        self.assertEqual((status["pid"], status["builds"]), (os.getpid(), 1))
+        self.assertEqual(send_request({"command": "shutdown"}, self.socket), {"ok": True, "log": []})
+        self.thread.join()
+        self.assertFalse(os.path.exists(self.socket))
+        self.assertFalse(daemon_running(self.socket))
+
+    def test_rebuild_updates_every_output(self):
+        self.config.compress, self.config.listings = ("gz",), ("posts",)
+        self.config.targets = [("/", self.path("out_root"))]
+        self.write("content/posts/tom/index.md", "---\ndate: 2024-01-01\n---\n# Tom\n\n" + "Old words. " * 50)
+        self.assertTrue(send_request({"command": "build"}, self.socket)["ok"])
+        self.edit("content/posts/tom/index.md", "---\ndate: 2024-01-01\n---\n# Thomas\n\n" + "New words. " * 50)
+        response = send_request({"command": "rebuild", "paths": [self.path("content", "posts")]}, self.socket)
+        self.assertTrue(response["ok"])
+        for rel_path in ("docs/posts/tom/index.html", "out_root/posts/tom/index.html"):
+            self.assertIn("New words.", self.read(rel_path))
+        self.assertIn("New words.", gzip.decompress(self.read("docs/posts/tom/index.html.gz", "rb")).decode())
+        self.assertIn("Thomas", self.read("docs/posts/index.html"))
+
+    def test_workers_kept_between_builds(self):
+        self.config.jobs = 2
+        self.assertTrue(send_request({"command": "build", "full": True}, self.socket)["ok"])
+        pool = generate_page._pool[0]
+        self.edit("content/index.md", "# Home\n\nEdited.")
+        self.edit("content/blog/index.md", "# Blog\n\nEdited.")
+        self.assertTrue(send_request({"command": "build"}, self.socket)["ok"])
+        self.assertIs(generate_page._pool[0], pool)
+        self.assertIn("Edited.", self.read("docs/blog/index.html"))
+        send_request({"command": "shutdown"}, self.socket)
+        self.thread.join()
+        self.assertIsNone(generate_page._pool)
+
+    def test_second_daemon_refused(self):
+        with self.assertRaises(Exception):
+            serve_daemon(self.config, self.socket)
+        self.assertTrue(send_request({"command": "status"}, self.socket)["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from depgraph import resolve_link, link_target, InputState, explain
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_resolve_link(self):
+        self.assertEqual(resolve_link("/blog/tom", "index.html"), "blog/tom")
+        self.assertEqual(resolve_link("../tom.png?v=2#top", "blog/post/index.html"), "blog/tom.png")
+        self.assertEqual(resolve_link("/", "blog/index.html"), "")
+        self.assertIsNone(resolve_link("https://example.com/", "index.html"))
+        self.assertIsNone(resolve_link("#section", "index.html"))
+        self.assertIsNone(resolve_link("mailto:me@example.com", "index.html"))
+
+    def test_link_target(self):
+        outputs = {"blog/tom/index.html", "contact.html", "index.html"}
+        self.assertEqual(link_target("blog/tom", outputs), "blog/tom/index.html")
+        self.assertEqual(link_target("contact", outputs), "contact.html")
+        self.assertEqual(link_target("", outputs), "index.html")
+        self.assertEqual(link_target("gone", outputs), "gone")
+
+    def test_explain(self):
+        state = InputState("/site/", ["index.html"], ["images/a.png"])
+        inputs = {"config:basepath": "/site/", "link:index.html": "page", "link:images/a.png": "static"}
+        self.assertEqual(explain(inputs, state), [])
+        self.assertEqual(explain(None, state), ["new output"])
+        self.assertEqual(explain({**inputs, "config:basepath": "/"}, state), ["basepath changed from '/' to '/site/'"])
+        self.assertEqual(explain({**inputs, "link:gone.html": "page"}, state),
+                         ["link target gone.html is now missing (was page)"])
+        self.assertEqual(explain({**inputs, "template:templates/gone.html": "abc"}, state),
+                         ["template templates/gone.html was removed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import io, os, tracemalloc, unittest
+import generate_page
+from generate_page import collect_pages, gen_page_recursive, PageErrors, generate_page_streaming, read_page_metadata
+from front_matter import read_front_matter, split_front_matter
+from profiling import BuildProfile
+from fixtures import TempDirTestCase
+
+
+class TestGeneratePages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self.path("content")
+        self.template = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+        for i in range(12):
+            self.write(f"content/section{i % 3}/post{i}.md",
+                       f"# Post {i}\n\nSome **bold** text and a [link](/section{i % 3}/post{i}).")
+
+    def read_tree(self, root):
+        tree = {}
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                with open(os.path.join(dirpath, file)) as f:
+                    tree[os.path.relpath(os.path.join(dirpath, file), root)] = f.read()
+        return tree
+
+    def test_collect_pages(self):
+        dest = self.path("docs")
+        os.makedirs(dest)
+        pages = collect_pages(self.content, dest)
+        self.assertEqual(len(pages), 12)
+        self.assertIn((os.path.join(self.content, "section0", "post0.md"),
+                       os.path.join(dest, "section0", "post0.html")), pages)
+        self.assertTrue(os.path.isdir(os.path.join(dest, "section2")))
+
+    def test_parallel_matches_serial(self):
+        serial, parallel = self.path("serial"), self.path("parallel")
+        os.makedirs(serial)
+        os.makedirs(parallel)
+        gen_page_recursive(self.content, self.template, serial, "/site/", jobs=1)
+        gen_page_recursive(self.content, self.template, parallel, "/site/", jobs=4)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+        self.assertEqual(len(self.read_tree(serial)), 12)
+
+    def test_profiled_build_matches(self):
+        plain, profiled = self.path("plain"), self.path("profiled")
+        os.makedirs(plain)
+        os.makedirs(profiled)
+        profile = BuildProfile()
+        gen_page_recursive(self.content, self.template, plain, "/site/")
+        gen_page_recursive(self.content, self.template, profiled, "/site/", jobs=2, profile=profile)
+        self.assertEqual(self.read_tree(plain), self.read_tree(profiled))
+        self.assertEqual(len(profile.pages), 12)
+        self.assertEqual(set(profile.phases), {"read", "block split", "block classification", "inline parsing",
+                                               "serialization", "templating", "write"})
+        self.assertIn("Slowest 3 of 12 pages", profile.summary(3))
+
+    def test_targets_share_one_parse(self):
+        self.write("content/section0/post0.md",
+                   "---\ntitle: Front\n---\n![img](/images/a.png) [home](/)\n\n```\n[not](/a/link)\n```")
+        single = {basepath: self.path(name) for basepath, name in (("/", "root"), ("/site/", "site"))}
+        for basepath, dest in single.items():
+            os.makedirs(dest)
+            gen_page_recursive(self.content, self.template, dest, basepath)
+        multi, other = self.path("multi"), self.path("other")
+        os.makedirs(multi)
+        generate_page.configure_block_cache(64)
+        try:
+            gen_page_recursive(self.content, self.template, multi, "/", jobs=2, targets=[(other, "/site/")])
+        finally:
+            generate_page.configure_block_cache(0)
+        self.assertEqual(self.read_tree(multi), self.read_tree(single["/"]))
+        self.assertEqual(self.read_tree(other), self.read_tree(single["/site/"]))
+
+    def test_streaming_matches(self):
+        source = self.write("big.md", "---\ntemplate: \n---\nintro [home](/)\n\n# Big\n\n```\na\n\nb\n```\n\n- x\n- **y**\n")
+        plain, streamed = self.path("plain.html"), self.path("streamed.html")
+        generate_page.generate_page(source, self.template, plain, "/site/")
+        generate_page_streaming(source, self.template, streamed, "/site/")
+        with open(plain) as a, open(streamed) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_streaming_memory_bounded(self):
+        source, dest = self.path("huge.md"), self.path("huge.html")
+        paragraph = "Some **bold** words and a [link](/x) " * 20
+        with open(source, "w") as file:
+            file.write("# Huge\n\n")
+            for _ in range(1500):
+                file.write(paragraph + "\n\n")
+        size = os.path.getsize(source)
+        tracemalloc.start()
+        generate_page_streaming(source, self.template, dest, "/")
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertGreater(size, 1_000_000)
+        self.assertLess(peak, size // 4)
+
+    def test_read_front_matter(self):
+        file = io.StringIO("---\ntitle: T\n---\n# Body\n")
+        self.assertEqual(read_front_matter(file), {"title": "T"})
+        self.assertEqual(file.read(), "# Body\n")
+        file = io.StringIO("---\nnot closed\n")
+        self.assertEqual(read_front_matter(file), {})
+        self.assertEqual(file.read(), "---\nnot closed\n")
+
+    def test_typed_front_matter(self):
+        metadata, body = split_front_matter("---\ntags: [tolkien, lore]\ndraft: yes\ndate: 2024-01-01\n---\n# B\n")
+        self.assertEqual(metadata, {"tags": ["tolkien", "lore"], "draft": True, "date": "2024-01-01",
+                                    "timestamp": 1704067200.0})
+        self.assertEqual(body, "# B\n")
+
+    def test_page_metadata_reads_header_only(self):
+        source = self.write("meta.md", "---\ntitle: Front\n---\n# Heading\n\nun**closed")
+        self.assertEqual(read_page_metadata(source), {"title": "Front", "tags": [], "draft": False})
+        self.write(source, "Intro\n\n# Heading\n\nun**closed")
+        self.assertEqual(read_page_metadata(source)["title"], "Heading")
+
+    def test_front_matter_title_and_drafts(self):
+        self.write("content/section0/post0.md", "---\ntitle: Front title\n---\n# Post 0\n")
+        self.write("content/drafts/wip.md", "---\ndraft: true\n---\n# WIP\n\nun**closed")
+        dest = self.path("docs")
+        os.makedirs(dest)
+        pages = gen_page_recursive(self.content, self.template, dest, "/")
+        self.assertNotIn("drafts/wip.html", pages)
+        self.assertFalse(os.path.exists(os.path.join(dest, "drafts")))
+        self.assertEqual(pages["section0/post0.html"]["meta"]["title"], "Front title")
+        self.assertIn("<title>Front title</title>", self.read_tree(dest)[os.path.join("section0", "post0.html")])
+
+    def test_errors_gathered_per_file(self):
+        self.write("content/section0/broken.md", "# Broken\n\nunclosed **bold")
+        self.write("content/section1/broken.md", "# Broken\n\nunclosed `code")
+        dest = self.path("docs")
+        os.makedirs(dest)
+        with self.assertLogs(level="ERROR") as logs, self.assertRaises(PageErrors) as cm:
+            gen_page_recursive(self.content, self.template, dest, "/", jobs=2)
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("Invalid Markdown syntax for delimiter '**'", "".join(logs.output))
+        self.assertEqual(sorted(os.path.basename(os.path.dirname(path)) for path, _ in cm.exception.errors),
+                         ["section0", "section1"])
+        self.assertTrue(os.path.exists(os.path.join(dest, "section2", "post2.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
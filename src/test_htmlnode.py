@@ -1,5 +1,5 @@
 from htmlnode import HTMLNode, LeafNode, ParentNode
-import unittest
+import io, unittest
 
 class TestHTML(unittest.TestCase):
     def test_eq(self):
@@ -40,6 +40,30 @@ class TestParent(unittest.TestCase):
         "<div><span><b>grandchild</b></span></div>",
         )
 
+    def test_iter_html(self):
+        parent_node = ParentNode("div", [ParentNode("p", [LeafNode(None, "a "), LeafNode("b", "bold")]),
+                                         LeafNode("a", "link", {"href": "/x"})])
+        chunks = list(parent_node.iter_html())
+        self.assertEqual(chunks, ["<div>", "<p>", "a ", "<b>bold</b>", "</p>", '<a href="/x">link</a>', "</div>"])
+        self.assertEqual("".join(chunks), parent_node.to_html())
+
+    def test_write_to(self):
+        parent_node = ParentNode("ul", [ParentNode("li", [LeafNode(None, str(i))]) for i in range(3)])
+        buffer = io.StringIO()
+        parent_node.write_to(buffer)
+        self.assertEqual(buffer.getvalue(), "<ul><li>0</li><li>1</li><li>2</li></ul>")
+
+    def test_slotted_nodes(self):
+        leaf, parent = LeafNode("b", "x"), ParentNode("h" + "2", [])
+        self.assertFalse(hasattr(leaf, "__dict__"))
+        self.assertFalse(hasattr(parent, "__dict__"))
+        self.assertIs(leaf.props, parent.props)
+        self.assertIs(parent.tag, "h2")
+
+    def test_missing_value_raises(self):
+        with self.assertRaises(ValueError):
+            ParentNode("p", [LeafNode("b", None)]).to_html()
+
 if __name__ == "__main__":
     unittest.main()
 
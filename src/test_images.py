@@ -0,0 +1,77 @@
+import os, struct, unittest
+import inline_markdown
+from block_cache import BlockCache
+from images import read_dimensions, process_images, image_props
+from inline_markdown import markdown_to_html_node
+from fixtures import TempDirTestCase
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\0\0\0"
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 11, 8, height, width) + b"\x01\x01\x11\0"
+    return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class TestDimensions(TempDirTestCase):
+    def dimensions(self, name, data):
+        return read_dimensions(self.write(name, data))
+
+    def test_formats(self):
+        self.assertEqual(self.dimensions("a.png", png(1100, 438)), (1100, 438))
+        self.assertEqual(self.dimensions("a.gif", b"GIF89a" + struct.pack("<HH", 32, 16) + b"\0" * 22), (32, 16))
+        self.assertEqual(self.dimensions("a.jpg", jpeg(640, 480)), (640, 480))
+        vp8x = b"RIFF\0\0\0\0WEBPVP8X" + b"\0" * 8 + (299).to_bytes(3, "little") + (149).to_bytes(3, "little")
+        self.assertEqual(self.dimensions("a.webp", vp8x), (300, 150))
+        lossless = b"RIFF\0\0\0\0WEBPVP8L\0\0\0\0\x2f" + (99 | 49 << 14).to_bytes(4, "little") + b"\0" * 7
+        self.assertEqual(self.dimensions("b.webp", lossless), (100, 50))
+
+    def test_unknown_format(self):
+        self.assertIsNone(self.dimensions("a.png", b"not an image at all"))
+
+
+class TestImageStage(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static, self.cache = self.path("static"), self.path("cache")
+        self.write("static/images/tom.png", png(928, 468))
+
+    def tearDown(self):
+        super().tearDown()
+        inline_markdown.image_attributes = {}
+
+    def test_dimensions_are_cached(self):
+        attributes, _ = process_images(self.static, self.root, self.cache)
+        self.assertEqual(attributes, {"/images/tom.png": {"width": "928", "height": "468"}})
+        # Same size and mtime: the header is not read again
+        stat = os.stat(self.path("static", "images", "tom.png"))
+        self.write("static/images/tom.png", png(100, 100), mtime_ns=stat.st_mtime_ns)
+        attributes, _ = process_images(self.static, self.root, self.cache)
+        self.assertEqual(attributes["/images/tom.png"]["width"], "928")
+
+    def test_injected_into_img(self):
+        inline_markdown.image_attributes, _ = process_images(self.static, self.root, self.cache)
+        html = "".join(markdown_to_html_node("![Tom](/images/tom.png)").iter_html("/site/"))
+        self.assertEqual(html, '<div><p><img src="/site/images/tom.png" alt="Tom" width="928" height="468"></img></p></div>')
+
+    def test_block_cache_sees_new_dimensions(self):
+        cache = BlockCache()
+        inline_markdown.image_attributes = {"/images/tom.png": {"width": "928", "height": "468"}}
+        markdown_to_html_node("![Tom](/images/tom.png)", cache)
+        inline_markdown.image_attributes = {"/images/tom.png": {"width": "10", "height": "5"}}
+        html = markdown_to_html_node("![Tom](/images/tom.png)", cache).to_html()
+        self.assertIn('width="10"', html)
+
+    def test_srcset(self):
+        entry = {"width": 928, "height": 468, "variants": {"480": "x"}}
+        props = image_props("images/tom.png", entry)
+        self.assertEqual(props["srcset"], "/images/tom-480w.png 480w, /images/tom.png 928w")
+        inline_markdown.image_attributes = {"/images/tom.png": props}
+        html = "".join(markdown_to_html_node("![Tom](/images/tom.png)").iter_html("/site/"))
+        self.assertIn('srcset="/site/images/tom-480w.png 480w, /site/images/tom.png 928w"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
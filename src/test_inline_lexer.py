@@ -0,0 +1,148 @@
+import random, unittest
+from textnode import TextNode, TextType
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+    tokenize_inline,
+    text_to_children,
+    LINK_AT,
+)
+
+
+def multipass_text_to_textnodes(text):
+    # The previous five-pass implementation, kept as the reference for the lexer
+    nodes = [TextNode(line, TextType.TEXT) for line in text.split("\n")]
+    nodes = split_nodes_delimiter(nodes, '**', TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, '_', TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, '`', TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    return split_nodes_link(nodes)
+
+
+WORDS = ["the", "ring", "Tolkien", "hobbit", "elf,", "Mordor.", "x", "42", "(aside)", "a-b", "!", "]", "![", "[note]",
+         "[", "_", "my_func", "`", "**"]
+
+def random_words(rng, low=1, high=4):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def random_line(rng):
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        kind = rng.randrange(7)
+        if kind == 0:
+            parts.append(f"**{random_words(rng)}**")
+        elif kind == 1:
+            parts.append(f"_{random_words(rng)}_")
+        elif kind == 2:
+            parts.append(f"`{random_words(rng)}`")
+        elif kind == 3:
+            parts.append(f"![{random_words(rng, 0)}](/images/{rng.choice(['a', 'snake_case'])}.png)")
+        elif kind == 4:
+            parts.append(f"[{random_words(rng)}](https://example.com/{rng.choice(['a', 'some_page'])})")
+        elif kind == 5:
+            parts.append(rng.choice(WORDS))
+        else:
+            parts.append(" " * rng.randint(0, 2))
+    return "".join(parts)
+
+def has_whole_link(text):
+    # A link or image with a delimiter in its label or url, which the lexer keeps
+    # whole where the multi-pass splitter paired the delimiter across it
+    return any(delimiter in match.group() for match in LINK_AT.finditer(text) for delimiter in ("**", "_", "`"))
+
+
+class TestInlineLexer(unittest.TestCase):
+    def test_matches_multipass(self):
+        # Every text the multi-pass splitter rendered still renders, the same
+        # way unless it has a link kept whole (see test_intended_divergences)
+        rng = random.Random(1234)
+        whole = 0
+        for _ in range(3000):
+            text = "\n".join(random_line(rng) for _ in range(rng.randint(1, 3)))
+            try:
+                expected = multipass_text_to_textnodes(text)
+            except Exception:
+                continue
+            nodes = text_to_textnodes(text)
+            if has_whole_link(text):
+                whole += 1
+            else:
+                self.assertEqual(nodes, expected, text)
+        self.assertGreater(whole, 100)
+
+    def test_intended_divergences(self):
+        # Links and images are single tokens: a delimiter in the label or url
+        # stays there, and the label keeps its own markup
+        self.assertEqual(text_to_textnodes("[a_b](/u)"), [TextNode("a_b", TextType.LINK, "/u")])
+        with self.assertRaises(Exception):
+            multipass_text_to_textnodes("[a_b](/u)")
+        self.assertEqual(text_to_textnodes("![x](/images/snake_case.png) ![y](/a.png)"), [
+            TextNode("x", TextType.IMAGE, "/images/snake_case.png"),
+            TextNode(" ", TextType.TEXT),
+            TextNode("y", TextType.IMAGE, "/a.png"),
+        ])
+        self.assertEqual(multipass_text_to_textnodes("[**a**](/u)"), [
+            TextNode("[", TextType.TEXT), TextNode("a", TextType.BOLD), TextNode("](/u)", TextType.TEXT),
+        ])
+        self.assertEqual(text_to_textnodes("[**a**](/u)"),
+                         [TextNode("**a**", TextType.LINK, "/u", [TextNode("a", TextType.BOLD)])])
+        # A delimiter inside another span is text, where the multi-pass splitter
+        # counted it over the whole line and failed
+        self.assertEqual(text_to_textnodes("`a ** b` c"),
+                         [TextNode("a ** b", TextType.CODE), TextNode(" c", TextType.TEXT)])
+        with self.assertRaises(Exception):
+            multipass_text_to_textnodes("`a ** b` c")
+
+    def test_delimiter_paired_across_link(self):
+        # Left open once the link is taken whole, so the line renders as it always did
+        for text in ("[a_b](/u) and c_d", "a)![_](  )_ ", "[a **b](/u) c**"):
+            self.assertEqual(text_to_textnodes(text), multipass_text_to_textnodes(text), text)
+
+    def test_empty_and_plain_lines(self):
+        self.assertEqual(tokenize_inline(""), [TextNode("", TextType.TEXT)])
+        self.assertEqual(tokenize_inline("just prose"), [TextNode("just prose", TextType.TEXT)])
+
+    def test_unclosed_delimiter(self):
+        with self.assertRaises(Exception):
+            tokenize_inline("this is **not closed")
+        with self.assertRaises(Exception):
+            multipass_text_to_textnodes("this is **not closed")
+
+    def test_bold_inside_link(self):
+        nodes = text_to_textnodes("see [the **best** post](/blog/tom) now")
+        self.assertEqual(nodes, [
+            TextNode("see ", TextType.TEXT),
+            TextNode("the **best** post", TextType.LINK, "/blog/tom", [
+                TextNode("the ", TextType.TEXT),
+                TextNode("best", TextType.BOLD),
+                TextNode(" post", TextType.TEXT),
+            ]),
+            TextNode(" now", TextType.TEXT),
+        ])
+        html = "".join(node.to_html() for node in text_to_children("[the **best** post](/blog/tom)"))
+        self.assertEqual(html, '<a href="/blog/tom">the <b>best</b> post</a>')
+
+    def test_underscore_in_url(self):
+        self.assertEqual(text_to_textnodes("[docs](https://example.com/some_page_name)"),
+                         [TextNode("docs", TextType.LINK, "https://example.com/some_page_name")])
+
+    def test_unbalanced_delimiter_in_label(self):
+        # The label stays plain text instead of failing the page
+        self.assertEqual(text_to_textnodes("Read [the snake_case guide](/docs/snake_case) today."), [
+            TextNode("Read ", TextType.TEXT),
+            TextNode("the snake_case guide", TextType.LINK, "/docs/snake_case"),
+            TextNode(" today.", TextType.TEXT),
+        ])
+        self.assertEqual(text_to_textnodes("See [my_func](/api#my_func)."), [
+            TextNode("See ", TextType.TEXT),
+            TextNode("my_func", TextType.LINK, "/api#my_func"),
+            TextNode(".", TextType.TEXT),
+        ])
+        html = "".join(node.to_html() for node in text_to_children("[snake_case](/docs)"))
+        self.assertEqual(html, '<a href="/docs">snake_case</a>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os, unittest
+import generate_page
+from build import build_full, build_incremental
+from link_check import find_broken_links, page_link_targets
+from fixtures import TempDirTestCase
+
+
+class TestFindBrokenLinks(unittest.TestCase):
+    def test_resolution(self):
+        outputs = {"index.html", "blog/tom/index.html", "images/tom.png", "index.css"}
+        pages = {"index.html": ["/blog/tom", "/blog/gone", "/images/tom.png", "https://example.com/", "#top"],
+                 "blog/tom/index.html": ["/", "../../index.css", "missing.png"]}
+        targets = page_link_targets(pages, outputs)
+        self.assertEqual(find_broken_links(targets, outputs),
+                         [("blog/tom/index.html", "blog/tom/missing.png"), ("index.html", "blog/gone")])
+
+
+class TestLinkCheckStage(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config(basepath="/site/", check_links=True)
+        self.write("static/images/a.png", "png")
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        self.write("content/index.md", "# Home\n\n[post](/blog/post) ![a](/images/a.png) ![b](/images/b.png)")
+        self.write("content/blog/post/index.md", "# Post\n\n[home](/)")
+
+    def tearDown(self):
+        super().tearDown()
+        generate_page.configure_block_cache(0)
+
+    def test_full_build_with_cached_fragments(self):
+        generate_page.configure_block_cache(64)
+        for _ in range(2):
+            with self.assertLogs(level="WARNING") as logs:
+                self.assertEqual(build_full(self.config), [("index.html", "images/b.png")])
+            self.assertIn("Broken link in index.html: /images/b.png does not exist", logs.output[0])
+
+    def test_incremental_build(self):
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(build_incremental(self.config), [("index.html", "images/b.png")])
+        # The skipped home page still reports its links; the removed post is now broken too
+        os.remove(self.path("content", "blog", "post", "index.md"))
+        self.write("static/images/b.png", "png")
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(build_incremental(self.config), [("index.html", "blog/post")])
+
+    def test_link_to_listing_page(self):
+        self.config.listings = ("blog",)
+        self.write("content/links.md", "# Links\n\n[all posts](/blog/)")
+        self.write("static/images/b.png", "png")
+        self.assertEqual(build_full(self.config), [])
+        self.assertEqual(build_incremental(self.config), [])
+        self.edit("content/index.md", "# Home\n\n[all posts](/blog/)")
+        self.assertEqual(build_incremental(self.config), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
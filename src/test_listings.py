@@ -0,0 +1,66 @@
+import os, unittest
+from listings import plan_listings, write_listings, slugify, listing_posts
+from front_matter import split_front_matter
+from site_index import page_date
+from fixtures import TempDirTestCase
+
+
+def dated(date, **metadata):
+    return {**split_front_matter(f"---\ndate: {date}\n---\n")[0], **metadata}
+
+
+def posts(count):
+    return {f"blog/post{i}/index.html": dated(f"2024-01-{i + 1:02d}", title=f"Post {i}",
+                                              tags=["Even"] if i % 2 == 0 else []) for i in range(count)}
+
+
+class TestListings(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = self.path("docs")
+        self.template = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+
+    def test_plan(self):
+        pages = {**posts(5), "index.html": {"title": "Home"}}
+        plan = plan_listings(pages, ["blog"], per_page=2)
+        self.assertEqual(sorted(plan), ["blog/index.html", "blog/page/2/index.html", "blog/page/3/index.html",
+                                        "blog/tags/even/index.html", "blog/tags/even/page/2/index.html"])
+        first = plan["blog/index.html"]
+        self.assertEqual(first["posts"], [["/blog/post4/", "Post 4", "2024-01-05"], ["/blog/post3/", "Post 3", "2024-01-04"]])
+        self.assertEqual((first["newer"], first["older"]), (None, "/blog/page/2/"))
+        self.assertEqual(plan["blog/page/3/index.html"]["newer"], "/blog/page/2/")
+        self.assertEqual(slugify("Lord of the Rings!"), "lord-of-the-rings")
+
+    def test_posts_ordered_by_time(self):
+        pages = {"blog/a/index.html": dated("2024-01-05 23:00:00-08:00"),
+                 "blog/b/index.html": dated("2024-01-06T01:00:00+00:00"),
+                 "blog/c/index.html": dated("2024-9-1"), "blog/d/index.html": dated("2024-10-01"),
+                 "blog/e/index.html": {"title": "Undated"}, "blog/f/index.html": dated("someday")}
+        order = [rel_path[5] for rel_path, _ in listing_posts(pages, "blog")]
+        self.assertEqual(order, ["d", "c", "a", "b", "f", "e"])
+        # The feed orders the dated posts the same way
+        feed = sorted("abcd", key=lambda name: page_date(pages[f"blog/{name}/index.html"]), reverse=True)
+        self.assertEqual(feed, order[:4])
+
+    def test_only_affected_pages_rewritten(self):
+        pages = posts(5)
+        entries = write_listings(self.dest, pages, ["blog"], self.template, "/site/", per_page=2)
+        self.assertIn('<a href="/site/blog/page/2/">Older posts</a>', self.read("docs/blog/index.html"))
+        for rel_path in entries:
+            os.utime(os.path.join(self.dest, rel_path), ns=(0, 0))
+        # Retitling the oldest post only touches the last page of the listing
+        pages["blog/post0/index.html"] = {**pages["blog/post0/index.html"], "title": "Renamed"}
+        entries = write_listings(self.dest, pages, ["blog"], self.template, "/site/", per_page=2, entries=entries)
+        changed = sorted(rel_path for rel_path in entries if os.stat(os.path.join(self.dest, rel_path)).st_mtime_ns)
+        self.assertEqual(changed, ["blog/page/3/index.html", "blog/tags/even/page/2/index.html"])
+        # Fewer posts, fewer pages
+        entries = write_listings(self.dest, posts(2), ["blog"], self.template, "/site/", per_page=2, entries=entries)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "page")))
+
+    def test_conflict_with_content_page(self):
+        with self.assertRaises(Exception):
+            write_listings(self.dest, {**posts(1), "blog/index.html": {}}, ["blog"], self.template)
+
+
+if __name__ == "__main__":
+    unittest.main()
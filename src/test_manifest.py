@@ -0,0 +1,126 @@
+import os, unittest
+from unittest import mock
+import generate_page
+from build import build_incremental
+from manifest import load_manifest, save_manifest, prune_outputs, new_manifest, manifest_path
+from generate_page import gen_page_incremental
+from fixtures import TempDirTestCase
+
+
+class TestManifest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content, self.dest, self.template = self.path("content"), self.path("docs"), self.path("template.html")
+        os.makedirs(self.dest)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\nHello")
+        self.write("content/blog/post.md", "# Post\n\nBody")
+
+    def build(self, entries, basepath="/"):
+        return gen_page_incremental(self.content, self.template, self.dest, basepath, entries)
+
+    def mtime(self, rel_path):
+        return os.stat(os.path.join(self.dest, rel_path)).st_mtime_ns
+
+    def test_roundtrip(self):
+        location = manifest_path(self.dest, self.path("manifests"))
+        self.assertEqual(load_manifest(location), new_manifest())
+        manifest = new_manifest()
+        manifest["pages"] = self.build({})
+        save_manifest(location, manifest)
+        self.assertEqual(load_manifest(location), manifest)
+        self.assertEqual(os.listdir(os.path.dirname(location)), [os.path.basename(location)])
+        self.assertTrue(os.path.basename(location).startswith("docs-"))
+        self.assertEqual(sorted(manifest["pages"]), ["blog/post.html", "index.html"])
+
+    def test_only_stale_pages_rebuilt(self):
+        entries = self.build({})
+        os.utime(os.path.join(self.dest, "index.html"), ns=(0, 0))
+        os.utime(os.path.join(self.dest, "blog", "post.html"), ns=(0, 0))
+        self.write("content/blog/post.md", "# Post\n\nChanged")
+        self.build(entries)
+        self.assertEqual(self.mtime("index.html"), 0)
+        self.assertNotEqual(self.mtime("blog/post.html"), 0)
+
+    def test_template_and_basepath_invalidate(self):
+        entries = self.build({})
+        os.utime(os.path.join(self.dest, "index.html"), ns=(0, 0))
+        entries = self.build(entries, "/site/")
+        self.assertNotEqual(self.mtime("index.html"), 0)
+        os.utime(os.path.join(self.dest, "index.html"), ns=(0, 0))
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build(entries, "/site/")
+        self.assertNotEqual(self.mtime("index.html"), 0)
+
+    def test_deleted_template_rebuilds(self):
+        named = self.write("templates/post.html", "<post>{{ Title }}</post>")
+        self.write("content/blog/post.md", "---\ntemplate: post\n---\n# Post")
+        entries = self.build({})
+        self.write("content/blog/post.md", "# Post")
+        os.remove(named)
+        with self.assertLogs(level="INFO") as logs:
+            gen_page_incremental(self.content, self.template, self.dest, "/", entries, explain_rebuilds=True)
+        self.assertIn(f"template {named} was removed", logs.output[0])
+        self.assertEqual(self.read("docs/blog/post.html"), "<title>Post</title><div><h1>Post</h1></div>")
+
+    def test_linked_page_removal_invalidates(self):
+        self.write("content/index.md", "# Home\n\n[post](/blog/post) and [away](https://example.com)")
+        entries = self.build({})
+        self.assertEqual(entries["index.html"]["inputs"]["link:blog/post.html"], "page")
+        os.utime(os.path.join(self.dest, "index.html"), ns=(0, 0))
+        self.write("content/blog/post.md", "# Post\n\nChanged")
+        entries = self.build(entries)
+        self.assertEqual(self.mtime("index.html"), 0)
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        with self.assertLogs(level="INFO") as logs:
+            entries = gen_page_incremental(self.content, self.template, self.dest, "/", entries, explain_rebuilds=True)
+        self.assertNotEqual(self.mtime("index.html"), 0)
+        self.assertEqual(entries["index.html"]["inputs"]["link:blog/post"], "missing")
+        self.assertIn("index.html: link target blog/post.html is now missing (was page)", logs.output[0])
+
+    def test_prune_deleted_source(self):
+        entries = self.build({})
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        new_entries = self.build(entries)
+        removed = prune_outputs(self.dest, entries, new_entries)
+        self.assertEqual(removed, ["blog/post.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+
+class TestIncrementalTargets(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config(targets=[("/site/", self.path("other"))])
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        self.write("content/index.md", "# Home\n\n[post](/blog/post)")
+        self.write("content/blog/post.md", "# Post\n\n[home](/)")
+
+    def parses(self):
+        # Every markdown parse of generate_page_targets, whether for one output or several
+        return (mock.patch("generate_page.markdown_to_html_node", wraps=generate_page.markdown_to_html_node),
+                mock.patch("generate_page.iter_markdown_html", wraps=generate_page.iter_markdown_html))
+
+    def test_stale_page_parsed_once(self):
+        build_incremental(self.config)
+        self.edit("content/blog/post.md", "# Post\n\n[home](/) again")
+        single, multi = self.parses()
+        with single as single, multi as multi:
+            build_incremental(self.config)
+        self.assertEqual((single.call_count, multi.call_count), (0, 1))
+        for rel_path, basepath in (("docs/blog/post.html", "/"), ("other/blog/post.html", "/site/")):
+            self.assertEqual(self.read(rel_path), f'Post<div><h1>Post</h1><p><a href="{basepath}">home</a> again</p></div>')
+
+    def test_page_stale_in_one_target(self):
+        build_incremental(self.config)
+        os.remove(self.path("other", "index.html"))
+        single, multi = self.parses()
+        with single as single, multi as multi:
+            build_incremental(self.config)
+        self.assertEqual((single.call_count, multi.call_count), (1, 0))
+        self.assertIn('href="/site/blog/post"', self.read("other/index.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
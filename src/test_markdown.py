@@ -12,7 +12,9 @@ from inline_markdown import (
     markdown_to_blocks,
     block_to_blocktype,
     BlockType,
-    markdown_to_html_node
+    markdown_to_html_node,
+    scan_blocks,
+    Block,
 )
 
 
@@ -202,6 +204,37 @@ This is the same paragraph on a new line
         blocks = markdown_to_blocks(md)
         self.assertEqual(block_to_blocktype(blocks[0]),BlockType.UO_LIST)
         
+    def test_scan_blocks_line_ranges(self):
+        md = "# Title\n\npara one\npara two\n\n\n- a\n- b\n"
+        self.assertEqual(list(scan_blocks(md.split("\n"))), [
+            Block(BlockType.HEADING, "# Title", 1, 1),
+            Block(BlockType.PARAGRAPH, "para one\npara two", 3, 4),
+            Block(BlockType.UO_LIST, "- a\n- b", 7, 8),
+        ])
+
+    def test_scan_blocks_matches_split(self):
+        # Without fences the scanner agrees with splitting on blank lines
+        pieces = ["# Head", "## Sub head", "- a\n- b", "- a\nb", "1. x\n2. y", "1. x\n3. y",
+                  ">q\n>q", ">q\nq", "plain\ntext", "   indented para", "####### seven"]
+        for i in range(len(pieces)):
+            md = "\n\n\n".join(pieces[i:] + pieces[:i])
+            old_blocks = [item.strip() for item in md.split("\n\n") if item.strip()]
+            self.assertEqual(markdown_to_blocks(md), old_blocks)
+            self.assertEqual([block.block_type for block in scan_blocks(md.split("\n"))],
+                             [block_to_blocktype(block) for block in old_blocks])
+
+    def test_fenced_code_with_blank_lines(self):
+        md = "intro\n\n```\nfirst\n\n\nsecond\n```\nafter fence"
+        blocks = list(scan_blocks(md.split("\n")))
+        self.assertEqual([block.block_type for block in blocks], [BlockType.PARAGRAPH, BlockType.CODE, BlockType.PARAGRAPH])
+        self.assertEqual((blocks[1].start, blocks[1].end), (3, 8))
+        self.assertEqual(markdown_to_html_node(md).to_html(),
+                         "<div><p>intro</p><pre><code>first\n\n\nsecond\n</code></pre><p>after fence</p></div>")
+
+    def test_unclosed_fence(self):
+        blocks = list(scan_blocks(["```", "code", "", "more"]))
+        self.assertEqual(blocks, [Block(BlockType.CODE, "```\ncode\n\nmore\n```", 1, 4)])
+
     def test_paragraphs(self):
         md = """
 This is **bolded** paragraph
@@ -0,0 +1,90 @@
+import os, unittest
+from unittest import mock
+from build import build_full, build_incremental
+from generate_page import PageErrors
+from manifest import load_manifest
+from output import open_output, link_tree, swap_directory, staging_path, sync_filesystem
+from fixtures import TempDirTestCase
+
+
+class TestOutput(TempDirTestCase):
+    def test_open_output_never_writes_through_links(self):
+        self.write("live/index.html", "old")
+        link_tree(self.path("live"), self.path("staging"))
+        with open_output(self.path("staging", "index.html")) as file:
+            file.write("new")
+        self.assertEqual(self.read("live/index.html"), "old")
+        self.assertEqual(self.read("staging/index.html"), "new")
+
+    def test_swap_rename_and_symlink(self):
+        destination = self.path("docs")
+        for mode, text in (("rename", "one"), ("rename", "two"), ("symlink", "three"), ("symlink", "four"),
+                           ("rename", "five")):
+            self.write("docs.staging/index.html", text)
+            swap_directory(self.path("docs.staging"), destination, mode)
+            self.assertEqual(self.read("docs/index.html"), text)
+            self.assertEqual(os.path.islink(destination), mode == "symlink")
+        # Nothing left behind from earlier versions
+        self.assertEqual(os.listdir(self.root), ["docs"])
+
+    def test_sync_filesystem(self):
+        self.write("docs/index.html", "text")
+        self.assertIn(sync_filesystem(self.path("docs")), ("syncfs", "sync", "fsync"))
+
+
+class TestStagedBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config()
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        self.write("content/index.md", "# Home\n\nWelcome home.")
+        self.write("content/blog/index.md", "# Blog\n\nPosts.")
+
+    def test_failed_build_leaves_site_alone(self):
+        build_full(self.config)
+        self.edit("content/blog/index.md", "# Blog\n\nChanged.")
+        self.write("content/broken.md", "# Broken\n\nun**closed")
+        for build in (build_full, build_incremental):
+            with self.assertLogs(level="ERROR"), self.assertRaises(PageErrors):
+                build(self.config)
+            self.assertIn("Posts.", self.read("docs/blog/index.html"))
+            self.assertFalse(os.path.exists(staging_path(self.config.destination)))
+
+    def test_incremental_seeds_from_live_site(self):
+        build_incremental(self.config)
+        live = os.stat(self.path("docs", "index.html")).st_ino
+        self.edit("content/blog/index.md", "# Blog\n\nChanged.")
+        build_incremental(self.config)
+        self.assertEqual(os.stat(self.path("docs", "index.html")).st_ino, live)
+        self.assertIn("Changed.", self.read("docs/blog/index.html"))
+
+    def test_manifest_follows_the_live_site(self):
+        location = self.config.manifest_locations()[0]
+        build_incremental(self.config)
+        self.assertNotIn(".manifest.json", os.listdir(self.config.destination))
+        manifest = load_manifest(location)
+        self.assertIn("blog/index.html", manifest["pages"])
+        self.edit("content/blog/index.md", "# Blog\n\nChanged.")
+        self.write("content/broken.md", "# Broken\n\nun**closed")
+        with self.assertLogs(level="ERROR"), self.assertRaises(PageErrors):
+            build_incremental(self.config)
+        # The failed staging tree was discarded, and so was its manifest
+        self.assertEqual(load_manifest(location), manifest)
+        self.assertEqual(os.listdir(os.path.dirname(location)), [os.path.basename(location)])
+        os.remove(self.path("content", "broken.md"))
+        build_full(self.config)
+        self.assertFalse(os.path.exists(location))
+
+    def test_unexpected_error_not_masked(self):
+        self.config.staging = False
+        build_incremental(self.config)
+        manifest = load_manifest(self.config.manifest_locations()[0])
+        with mock.patch("build.render_planned", side_effect=ValueError("boom")):
+            with self.assertRaisesRegex(ValueError, "boom"):
+                build_incremental(self.config)
+        self.assertEqual(load_manifest(self.config.manifest_locations()[0]), manifest)
+
+
+if __name__ == "__main__":
+    unittest.main()
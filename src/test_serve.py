@@ -0,0 +1,44 @@
+import os, unittest
+from build import build_incremental
+from serve import Watcher, diff_snapshots
+from fixtures import TempDirTestCase
+
+
+class TestWatcher(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("template.html", "{{ Title }}|{{ Content }}")
+        self.write("static/index.css", "body {}")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post.md", "# Post")
+        config = self.site_config()
+        build_incremental(config)
+        self.watcher = Watcher(config)
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), 0)
+
+    def test_single_page_change(self):
+        self.edit("content/blog/post.md", "# Edited")
+        self.assertEqual(self.watcher.poll(), 1)
+        self.assertEqual(self.read("docs/blog/post.html"), "Edited|<div><h1>Edited</h1></div>")
+
+    def test_template_change_rebuilds_all(self):
+        self.edit("template.html", "<t>{{ Title }}</t>")
+        self.assertEqual(self.watcher.poll(), 2)
+        self.assertEqual(self.read("docs/index.html"), "<t>Home</t>")
+
+    def test_removed_sources(self):
+        os.remove(self.path("content", "blog", "post.md"))
+        os.remove(self.path("static", "index.css"))
+        self.assertEqual(self.watcher.poll(), 2)
+        self.assertFalse(os.path.exists(self.path("docs", "blog", "post.html")))
+        self.assertFalse(os.path.exists(self.path("docs", "index.css")))
+
+    def test_diff_snapshots(self):
+        changed, removed = diff_snapshots({"a": (1, 1, 1), "b": (1, 2, 1)}, {"a": (2, 1, 1), "c": (1, 3, 1)})
+        self.assertEqual((changed, removed), ({"a", "c"}, {"b"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import json, os, unittest
+from build import build_full, build_incremental
+from inline_markdown import markdown_to_html_node
+from site_index import PageSummary, build_search_index, page_url
+from fixtures import TempDirTestCase
+
+
+class TestSiteIndex(unittest.TestCase):
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url("blog/tom/index.html", "/site/"), "/site/blog/tom/")
+        self.assertEqual(page_url("about.html"), "/about.html")
+
+    def test_summary(self):
+        node = markdown_to_html_node("# Title\n\n[< Back](/)\n\nFirst **real** paragraph.\n\n- alike\n- Disney")
+        summary = PageSummary()
+        for child in node.children:
+            summary.add(child)
+        info = summary.to_dict("Title", {"date": "2024-05-01"})
+        self.assertEqual(info["excerpt"], "First real paragraph.")
+        self.assertEqual(info["date"], "2024-05-01")
+        self.assertIn("alike", info["tokens"])
+        self.assertIn("disney", info["tokens"])
+        self.assertNotIn("alikedisney", info["tokens"])
+
+    def test_delta_encoded_index(self):
+        pages = {f"p{i}.html": {"title": str(i), "tokens": ["all"] + (["even"] if i % 2 == 0 else [])}
+                 for i in range(6)}
+        index = build_search_index(pages)
+        self.assertEqual(index["index"]["all"], [0, 1, 1, 1, 1, 1])
+        self.assertEqual(index["index"]["even"], [0, 2, 2])
+        self.assertEqual(index["docs"][3], ["/p3.html", "3", ""])
+
+
+class TestSiteIndexStage(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config(basepath="/site/", site_url="https://example.com/", search_index=True)
+        os.makedirs(self.config.static)
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        self.write("content/index.md", "# Home\n\nWelcome home.")
+        self.write("content/blog/old/index.md", "---\ndate: 2020-01-01\n---\n# Old post\n\nOld words.")
+        self.write("content/blog/new/index.md", "---\ndate: 2024-01-01\n---\n# New post\n\nNew words.")
+
+    def test_full_build(self):
+        build_full(self.config)
+        feed = self.read("docs/blog/rss.xml")
+        self.assertLess(feed.index("New post"), feed.index("Old post"))
+        self.assertNotIn("Welcome home", feed)
+        self.assertIn("<loc>https://example.com/site/blog/new/</loc><lastmod>2024-01-01</lastmod>", self.read("docs/sitemap.xml"))
+        index = json.loads(self.read("docs/search-index.json"))
+        self.assertEqual([doc[1] for doc in index["docs"]], ["New post", "Old post", "Home"])
+        self.assertEqual(index["index"]["words"], [0, 1])
+
+    def test_incremental_keeps_unchanged_pages(self):
+        build_incremental(self.config)
+        self.edit("content/blog/new/index.md", "---\ndate: 2024-01-01\n---\n# Newer post\n\nNew words.")
+        build_incremental(self.config)
+        index = json.loads(self.read("docs/search-index.json"))
+        self.assertEqual([doc[1] for doc in index["docs"]], ["Newer post", "Old post", "Home"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os, unittest
+from static_gen import sync_dir_static, clone_file
+from fixtures import TempDirTestCase
+
+
+class TestStaticSync(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src, self.dest = self.path("static"), self.path("docs")
+        self.write("static/index.css", "body {}")
+        self.write("static/images/a.png", "png-a")
+        self.write("static/images/b.png", "png-b")
+
+    def test_initial_sync(self):
+        entries = sync_dir_static(self.src, self.dest, {})
+        self.assertEqual(sorted(entries), ["images/a.png", "images/b.png", "index.css"])
+        self.assertEqual(self.read("docs/images/b.png"), "png-b")
+
+    def test_skips_unchanged(self):
+        entries = sync_dir_static(self.src, self.dest, {})
+        os.utime(self.path("docs", "index.css"), ns=(0, 0))
+        self.write("static/images/a.png", "png-a2", mtime_ns=10**18)
+        sync_dir_static(self.src, self.dest, entries)
+        self.assertEqual(os.stat(self.path("docs", "index.css")).st_mtime_ns, 0)
+        self.assertEqual(self.read("docs/images/a.png"), "png-a2")
+
+    def test_hash_compare_ignores_touch(self):
+        entries = sync_dir_static(self.src, self.dest, {}, compare="hash")
+        os.utime(self.path("docs", "index.css"), ns=(0, 0))
+        self.write("static/index.css", "body {}", mtime_ns=10**18)
+        entries = sync_dir_static(self.src, self.dest, entries, compare="hash")
+        self.assertEqual(os.stat(self.path("docs", "index.css")).st_mtime_ns, 0)
+        self.assertIn("hash", entries["index.css"])
+
+    def test_link_never_writes_through(self):
+        sync_dir_static(self.src, self.dest, {}, link=True)
+        source = self.path("static", "index.css")
+        self.assertEqual(os.stat(source).st_ino, os.stat(self.path("docs", "index.css")).st_ino)
+        other = self.write("other.css", "p {}")
+        clone_file(other, self.path("docs", "index.css"))
+        self.assertEqual(self.read("static/index.css"), "body {}")
+        self.assertEqual(self.read("docs/index.css"), "p {}")
+
+
+if __name__ == "__main__":
+    unittest.main()
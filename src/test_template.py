@@ -0,0 +1,69 @@
+import os, tempfile, unittest
+from template import Template, load_template, resolve_template
+from front_matter import split_front_matter
+from generate_page import generate_page
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template('<title>{{ Title }}</title><link href="/index.css"><main>{{Content}}</main>', "/site/")
+        self.assertEqual(template.segments, [
+            (False, "<title>"),
+            (True, "Title"),
+            (False, '</title><link href="/site/index.css"><main>'),
+            (True, "Content"),
+            (False, "</main>"),
+        ])
+        self.assertEqual(template.slots, {"Title", "Content"})
+
+    def test_render_with_chunks(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        html = template.render(Title="Hi", Content=iter(["<p>", "a", "</p>"]))
+        self.assertEqual(html, "<h1>Hi</h1><p>a</p>")
+
+    def test_load_template_cached(self):
+        with tempfile.TemporaryDirectory() as root:
+            location = os.path.join(root, "template.html")
+            with open(location, "w") as file:
+                file.write("{{ Content }}")
+            self.assertIs(load_template(location, "/"), load_template(location, "/"))
+            self.assertIsNot(load_template(location, "/"), load_template(location, "/site/"))
+
+    def test_resolve_template(self):
+        self.assertEqual(resolve_template("site/template.html"), "site/template.html")
+        self.assertEqual(resolve_template("site/template.html", "post"), os.path.join("site", "templates", "post.html"))
+        with self.assertRaises(Exception):
+            resolve_template("template.html", "../secret")
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split(self):
+        metadata, body = split_front_matter("---\ntemplate: post\nTitle: A: B\n---\n# Heading\n")
+        self.assertEqual(metadata, {"template": "post", "title": "A: B"})
+        self.assertEqual(body, "# Heading\n")
+
+    def test_no_front_matter(self):
+        self.assertEqual(split_front_matter("# Heading\n\n---\n"), ({}, "# Heading\n\n---\n"))
+
+
+class TestGeneratePageTemplates(unittest.TestCase):
+    def test_named_template_and_basepath(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "templates"))
+            default = os.path.join(root, "template.html")
+            with open(default, "w") as file:
+                file.write("default {{ Content }}")
+            with open(os.path.join(root, "templates", "post.html"), "w") as file:
+                file.write('<link href="/a.css">{{ Title }}|{{ Content }}')
+            source, dest = os.path.join(root, "page.md"), os.path.join(root, "page.html")
+            with open(source, "w") as file:
+                file.write('---\ntemplate: post\n---\n# T\n\n[home](/index) and `href="/raw"`\n')
+            generate_page(source, default, dest, "/site/")
+            with open(dest) as file:
+                self.assertEqual(file.read(),
+                                 '<link href="/site/a.css">T|<div><h1>T</h1><p><a href="/site/index">home</a>'
+                                 ' and <code>href="/raw"</code></p></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json, os, unittest
+from unittest import mock
+import generate_page, manifest
+from build import build_incremental
+from manifest import load_manifest
+from tree import scan_tree, load_snapshot, diff_snapshots, update_snapshot
+from fixtures import TempDirTestCase
+
+
+class TestTree(TempDirTestCase):
+    def test_scan_tree(self):
+        for rel_path in ("site/b.md", "site/a/z.md", "site/a/y/x.css", "site/c.txt"):
+            self.write(rel_path, rel_path)
+        os.makedirs(self.path("site", "empty"))
+        tree = scan_tree(self.path("site"))
+        self.assertEqual(list(tree), ["a/y/x.css", "a/z.md", "b.md", "c.txt"])
+        stat = os.stat(self.path("site", "b.md"))
+        self.assertEqual(tree["b.md"], (stat.st_size, stat.st_mtime_ns, stat.st_ino))
+
+    def test_snapshot_roundtrip_and_diff(self):
+        self.write("site/a.md", "a")
+        self.write("site/b.md", "b")
+        old = load_snapshot(json.loads(json.dumps(scan_tree(self.path("site")))))
+        self.assertEqual(diff_snapshots(old, scan_tree(self.path("site"))), (set(), set()))
+        os.remove(self.path("site", "b.md"))
+        self.edit("site/a.md", "changed")
+        self.write("site/c.md", "c")
+        self.assertEqual(diff_snapshots(old, scan_tree(self.path("site"))), ({"a.md", "c.md"}, {"b.md"}))
+
+    def test_update_snapshot(self):
+        for rel_path in ("site/a-b.md", "site/a/x.md", "site/a/y.md", "site/c.md"):
+            self.write(rel_path, rel_path)
+        old = scan_tree(self.path("site"))
+        os.remove(self.path("site", "a", "y.md"))
+        self.write("site/a/z.md", "z")
+        self.edit("site/c.md", "changed")
+        self.edit("site/a-b.md", "unlisted")
+        paths = [self.path("site", "a"), self.path("site", "c.md"), self.path("other.md")]
+        updated = update_snapshot(old, self.path("site"), paths)
+        self.assertEqual(list(updated), ["a/x.md", "a/z.md", "a-b.md", "c.md"])
+        self.assertEqual(diff_snapshots(old, updated), ({"a/z.md", "c.md"}, {"a/y.md"}))
+
+
+class TestSnapshotReuse(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = self.site_config()
+        self.write("static/index.css", "body {}")
+        self.write("template.html", "{{ Title }}{{ Content }}")
+        for i in range(5):
+            self.write(f"content/blog/post{i}.md", f"# Post {i}\n\n[home](/)")
+
+    def test_unchanged_sources_not_read(self):
+        build_incremental(self.config)
+        self.assertEqual(sorted(load_manifest(self.config.manifest_locations()[0])["tree"]["content"]),
+                         [f"blog/post{i}.md" for i in range(5)])
+        edited = self.edit("content/blog/post3.md", "# Edited")
+        # A fresh process has none of the in-memory caches
+        manifest._hashes.clear()
+        generate_page._page_metadata.clear()
+        with mock.patch("manifest.hash_file", wraps=manifest.hash_file) as hashed, \
+             mock.patch("generate_page.read_page_metadata", wraps=generate_page.read_page_metadata) as read:
+            build_incremental(self.config)
+        self.assertEqual(sorted(call.args[0] for call in hashed.call_args_list), [edited, self.config.template])
+        self.assertEqual([call.args[0] for call in read.call_args_list], [edited])
+        self.assertEqual(self.read("docs/blog/post3.html"), "Edited<div><h1>Edited</h1></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
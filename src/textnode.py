@@ -9,15 +9,19 @@ class TextType(Enum):
     IMAGE = "image" # Images, in this format: ![alt text](url)
 
 class TextNode:
-    def __init__(self, text, text_type, url=None):
+    __slots__ = ("text", "text_type", "url", "children")
+
+    def __init__(self, text, text_type, url=None, children=None):
         self.text = text # text of the node
         self.text_type = text_type # type of text (TextType Enum)
         self.url = url # URL of link or image
+        self.children = children # nested TextNodes of a link label with markup, else None
         
     def __eq__(self, node):
         if all((self.text == node.text
                 ,self.text_type == node.text_type
-                ,self.url == node.url)):
+                ,self.url == node.url
+                ,self.children == node.children)):
             return True
         return False    
         
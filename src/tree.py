@@ -0,0 +1,60 @@
+import os
+
+# A snapshot maps every file below a root to its (size, mtime_ns, inode), keyed
+# by its path relative to the root with "/" separators. It takes one scandir
+# per directory: file types come from the directory listing itself and each
+# file is stat'ed exactly once, through its DirEntry.
+
+def file_state(stat):
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+def scan_tree(root, files=None, prefix=""):
+    # Files are listed directory by directory in name order
+    if files is None:
+        files = {}
+    with os.scandir(root) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            scan_tree(entry.path, files, prefix + entry.name + "/")
+            continue
+        try:
+            files[prefix + entry.name] = file_state(entry.stat())
+        except FileNotFoundError:
+            pass # removed since the listing
+    return files
+
+def update_snapshot(snapshot, root, paths):
+    # A copy of snapshot with the given files, or everything below the given
+    # directories, stat'ed again; paths outside root are ignored and every
+    # other file is taken to be unchanged
+    root = os.path.abspath(root)
+    updated = dict(snapshot)
+    for path in paths:
+        location = os.path.abspath(path)
+        if location != root and not location.startswith(root + os.sep):
+            continue
+        rel_path = os.path.relpath(location, root).replace(os.sep, "/")
+        prefix = "" if rel_path == "." else rel_path + "/"
+        for key in [key for key in updated if key == rel_path or key.startswith(prefix)]:
+            del updated[key]
+        if os.path.isdir(location):
+            scan_tree(location, updated, prefix)
+        elif os.path.isfile(location):
+            updated[rel_path] = file_state(os.stat(location))
+    # The order scan_tree lists files in
+    return dict(sorted(updated.items(), key=lambda item: item[0].split("/")))
+
+def load_snapshot(data):
+    # A snapshot read back from JSON, where the states became lists
+    return {rel_path: tuple(state) for rel_path, state in (data or {}).items()}
+
+def diff_snapshots(old, new):
+    changed = {path for path, state in new.items() if old.get(path) != state}
+    removed = set(old) - set(new)
+    return changed, removed
+
+def output_dirs(destination, rel_paths):
+    # Create the directories the given outputs go in, once each
+    for directory in sorted({os.path.dirname(rel_path) for rel_path in rel_paths}):
+        os.makedirs(os.path.join(destination, directory), exist_ok=True)